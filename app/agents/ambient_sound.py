@@ -2,6 +2,9 @@ import os
 import random
 from pathlib import Path
 
+# Ambient sound paths already known to exist on disk (shared across agent instances)
+_MATERIALIZED_PATHS = set()
+
 class AmbientSoundSelectorAgent:
     """
     Agent for selecting ambient sounds to accompany meditation scripts.
@@ -17,25 +20,28 @@ class AmbientSoundSelectorAgent:
             
         # Create a mapping of moods to ambient sound categories
         self.mood_to_sound_map = {
-            "calm": ["gentle_waves", "soft_rain", "forest_breeze"],
-            "focused": ["light_rain", "white_noise", "gentle_creek"],
-            "relaxed": ["beach_waves", "summer_night", "gentle_rain"],
-            "energized": ["flowing_river", "morning_birds", "spring_breeze"],
-            "grateful": ["garden_sounds", "gentle_stream", "light_wind"],
-            "happy": ["birds_chirping", "summer_meadow", "gentle_waves"],
-            "peaceful": ["soft_rain", "quiet_forest", "gentle_stream"],
-            "confident": ["ocean_waves", "steady_rain", "mountain_wind"],
-            "creative": ["flowing_water", "light_rain", "forest_sounds"],
-            "compassionate": ["gentle_waves", "soft_breeze", "quiet_garden"],
-            "mindful": ["zen_garden", "light_rain", "forest_ambience"],
-            "balanced": ["gentle_creek", "soft_rain", "light_wind"],
-            "resilient": ["ocean_waves", "mountain_stream", "steady_rain"],
-            "hopeful": ["morning_birds", "gentle_breeze", "spring_creek"],
-            "serene": ["gentle_stream", "soft_rain", "quiet_forest"]
+            "calm": ("gentle_waves", "soft_rain", "forest_breeze"),
+            "focused": ("light_rain", "white_noise", "gentle_creek"),
+            "relaxed": ("beach_waves", "summer_night", "gentle_rain"),
+            "energized": ("flowing_river", "morning_birds", "spring_breeze"),
+            "grateful": ("garden_sounds", "gentle_stream", "light_wind"),
+            "happy": ("birds_chirping", "summer_meadow", "gentle_waves"),
+            "peaceful": ("soft_rain", "quiet_forest", "gentle_stream"),
+            "confident": ("ocean_waves", "steady_rain", "mountain_wind"),
+            "creative": ("flowing_water", "light_rain", "forest_sounds"),
+            "compassionate": ("gentle_waves", "soft_breeze", "quiet_garden"),
+            "mindful": ("zen_garden", "light_rain", "forest_ambience"),
+            "balanced": ("gentle_creek", "soft_rain", "light_wind"),
+            "resilient": ("ocean_waves", "mountain_stream", "steady_rain"),
+            "hopeful": ("morning_birds", "gentle_breeze", "spring_creek"),
+            "serene": ("gentle_stream", "soft_rain", "quiet_forest")
         }
         
         # Default fallback sounds if a specific mood isn't found
-        self.default_sounds = ["gentle_waves", "soft_rain", "light_wind"]
+        self.default_sounds = ("gentle_waves", "soft_rain", "light_wind")
+        
+        # Memoized sound categories per raw mood string (skips normalization on repeats)
+        self._categories_by_mood = {}
         
         # Ensure the sounds directory exists (create it if not)
         os.makedirs(self.sounds_dir, exist_ok=True)
@@ -50,11 +56,13 @@ class AmbientSoundSelectorAgent:
         Returns:
             Path to the selected ambient sound file
         """
-        # Normalize the mood input
-        mood = mood.lower().strip()
-        
-        # Get the list of appropriate sound categories for this mood
-        sound_categories = self.mood_to_sound_map.get(mood, self.default_sounds)
+        # Get the appropriate sound categories for this mood (normalized on first use)
+        sound_categories = self._categories_by_mood.get(mood)
+        if sound_categories is None:
+            sound_categories = self.mood_to_sound_map.get(mood.lower().strip(), self.default_sounds)
+            # Bound the memo so arbitrary mood strings can't grow it indefinitely
+            if len(self._categories_by_mood) < 64:
+                self._categories_by_mood[mood] = sound_categories
         
         # Randomly select one of the sound categories
         selected_category = random.choice(sound_categories)
@@ -67,10 +75,12 @@ class AmbientSoundSelectorAgent:
         # In production, you would check for files of that category and select one
         placeholder_path = self.sounds_dir / f"{selected_category}.mp3"
         
-        # Create a placeholder file if it doesn't exist
-        if not placeholder_path.exists():
-            # In a production system, you would have real sound files
-            # For now, just create an empty file as a placeholder
-            placeholder_path.touch()
+        # Create a placeholder file if it doesn't exist (checked once per path)
+        if placeholder_path not in _MATERIALIZED_PATHS:
+            if not placeholder_path.exists():
+                # In a production system, you would have real sound files
+                # For now, just create an empty file as a placeholder
+                placeholder_path.touch()
+            _MATERIALIZED_PATHS.add(placeholder_path)
             
         return str(placeholder_path) 
\ No newline at end of file
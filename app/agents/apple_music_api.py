@@ -4,16 +4,75 @@ import logging
 import asyncio
 import time
 import json
+import functools
+from collections import OrderedDict, deque
+from types import MappingProxyType
 from pathlib import Path
 import jwt
 import httpx
-from datetime import datetime, timedelta
+from cryptography.hazmat.primitives import serialization
 from typing import Dict, List, Tuple, Optional, Any, Union
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Module logger (handlers are configured by the application, not here)
 logger = logging.getLogger(__name__)
 
+# Use orjson for faster cache and API response parsing when it's installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# HTTP/2 lets concurrent searches share one multiplexed connection (requires h2)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Map moods to search queries for Apple Music (read-only, shared by all agent instances)
+_MOOD_TO_QUERY = MappingProxyType({
+    "calm": ("calm meditation music", "calming meditation guided", "peaceful meditation"),
+    "focused": ("focus meditation", "concentration meditation", "focus meditation guided"),
+    "relaxed": ("relaxing meditation", "relaxation guided meditation", "sleep meditation"),
+    "energized": ("energizing meditation music", "morning meditation", "energy boost meditation"),
+    "grateful": ("gratitude meditation", "gratitude practice guided", "appreciation meditation"),
+    "happy": ("happiness meditation", "joyful meditation guided", "positive energy meditation"),
+    "peaceful": ("peaceful meditation", "peace meditation guided", "tranquil meditation"),
+    "confident": ("confidence meditation", "self-esteem meditation", "empowerment meditation"),
+    "creative": ("creativity meditation", "creative flow meditation", "inspiration meditation"),
+    "compassionate": ("compassion meditation", "loving-kindness meditation", "heart meditation")
+})
+
+# Default queries if mood isn't in our predefined list
+_DEFAULT_QUERIES = ("meditation music", "mindfulness meditation", "relaxing music")
+
+@functools.lru_cache(maxsize=64)
+def _queries_for(mood, language):
+    """Get the Apple Music search queries for a mood, with the language appended if not English."""
+    queries = _MOOD_TO_QUERY.get(mood, _DEFAULT_QUERIES)
+    if language.lower() != "english":
+        queries = tuple(f"{query} {language}" for query in queries)
+    return queries
+
+# Base URL for all Apple Music API requests
+APPLE_MUSIC_API_URL = "https://api.music.apple.com"
+
+# Song attributes read by the duration filter and _prepare_track_response
+_SONG_FIELDS = "name,artistName,albumName,durationInMillis,previews,artwork,url"
+
+def _json_loads(data):
+    """Parse JSON from bytes or str, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj):
+    """Serialize an object to JSON bytes, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
 class AppleMusicAgent:
     """
     Agent for retrieving meditation audio from Apple Music API.
@@ -39,56 +98,177 @@ class AppleMusicAgent:
         self.key_id = os.getenv("APPLE_KEY_ID")
         self.private_key = os.getenv("APPLE_PRIVATE_KEY")
         
-        # Cache for search results
+        # Parse the PEM private key once so token signing doesn't re-parse it
+        self._signing_key = self._load_signing_key()
+        
+        # Cache for search results (LRU-bounded to the most recent mood/language keys)
         self.search_cache_file = self.cache_dir / "apple_music_cache.json"
+        self.search_cache_max_entries = 128
         self.search_cache = self._load_search_cache()
         
-        # Map moods to search queries for Apple Music
-        self.mood_to_query = {
-            "calm": ["calm meditation music", "calming meditation guided", "peaceful meditation"],
-            "focused": ["focus meditation", "concentration meditation", "focus meditation guided"],
-            "relaxed": ["relaxing meditation", "relaxation guided meditation", "sleep meditation"],
-            "energized": ["energizing meditation music", "morning meditation", "energy boost meditation"],
-            "grateful": ["gratitude meditation", "gratitude practice guided", "appreciation meditation"],
-            "happy": ["happiness meditation", "joyful meditation guided", "positive energy meditation"],
-            "peaceful": ["peaceful meditation", "peace meditation guided", "tranquil meditation"],
-            "confident": ["confidence meditation", "self-esteem meditation", "empowerment meditation"],
-            "creative": ["creativity meditation", "creative flow meditation", "inspiration meditation"],
-            "compassionate": ["compassion meditation", "loving-kindness meditation", "heart meditation"]
-        }
+        # Debounce cache writes: flush after this many updates or this many seconds
+        self._cache_flush_every = 8
+        self._cache_flush_interval_seconds = 30
+        self._dirty_count = 0
+        self._last_flush = 0.0
+        self._flush_task = None
+        
+        # Timer that writes the tail of a burst once it goes quiet, and the loop it runs on
+        self._flush_timer = None
+        self._flush_timer_loop = None
         
-        # List of audio tracks that have been recently used
-        self.recently_used_tracks = []
+        # Audio tracks that have been recently used (last 5), with a set for fast lookups
+        self.recently_used_tracks = deque(maxlen=5)
+        self._recent_ids = set()
         
-        # Developer token and expiration
+        # Developer token and expiration (Unix timestamp)
         self._developer_token = None
         self._token_expiration = None
+        
+        # Refresh the developer token this many seconds before it actually expires
+        self._token_expiry_skew_seconds = 60
+        
+        # Limit the number of concurrent Apple Music API requests
+        self._search_semaphore = asyncio.Semaphore(3)
+        
+        # Stop waiting for further searches once this many suitable tracks are found
+        self.enough_tracks = 20
+        
+        # Searches currently running, keyed by cache key, so concurrent callers share them
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        # Shared HTTP client (created lazily so connections are reused across calls)
+        self._client: Optional[httpx.AsyncClient] = None
     
     def _load_search_cache(self):
         """
         Load search cache from file.
         
         Returns:
-            Dict containing the search cache
+            OrderedDict containing the search cache, oldest entries first
         """
+        cache = OrderedDict()
         if self.search_cache_file.exists():
             try:
-                with open(self.search_cache_file, 'r') as f:
-                    return json.load(f)
+                cache.update(_json_loads(self.search_cache_file.read_bytes()))
             except Exception as e:
-                logger.error(f"Error loading search cache: {str(e)}")
+                logger.error("Error loading search cache: %s", e)
+        
+        # Drop the oldest entries if the file holds more than we keep in memory
+        while len(cache) > self.search_cache_max_entries:
+            cache.popitem(last=False)
+        
+        return cache
+    
+    def _cache_get(self, key):
+        """
+        Get cached search results, marking the key as most recently used.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached list of tracks, or None if not cached
+        """
+        tracks = self.search_cache.get(key)
+        if tracks is not None:
+            self.search_cache.move_to_end(key)
+        return tracks
+    
+    def _cache_put(self, key, tracks):
+        """
+        Store search results, evicting the least recently used keys when full.
+        
+        Args:
+            key: Cache key
+            tracks: List of tracks to cache
+        """
+        self.search_cache[key] = tracks
+        self.search_cache.move_to_end(key)
+        while len(self.search_cache) > self.search_cache_max_entries:
+            self.search_cache.popitem(last=False)
+    
+    def _save_search_cache(self, cache=None):
+        """
+        Save search cache to file atomically (write to a temp file, then replace).
+        
+        Args:
+            cache: Snapshot of the cache to write (defaults to the current cache)
+        """
+        if cache is None:
+            cache = dict(self.search_cache)
+        
+        tmp_path = self.search_cache_file.with_suffix('.tmp')
+        try:
+            tmp_path.write_bytes(_json_dumps(cache))
+            os.replace(tmp_path, self.search_cache_file)
+        except Exception as e:
+            logger.error("Error saving search cache: %s", e)
+    
+    def _schedule_search_cache_flush(self):
+        """
+        Record a cache update and flush to disk in a background thread once
+        enough updates have accumulated or enough time has passed.
         
-        return {}
+        Updates that aren't flushed right away are written by a timer after
+        the flush interval, so the tail of a burst isn't lost.
+        """
+        self._dirty_count += 1
+        
+        due = (self._dirty_count >= self._cache_flush_every or
+               time.time() - self._last_flush > self._cache_flush_interval_seconds)
+        if due and (self._flush_task is None or self._flush_task.done()):
+            self._start_search_cache_flush()
+            return
+        
+        loop = asyncio.get_running_loop()
+        if self._flush_timer is None or self._flush_timer_loop is not loop:
+            self._flush_timer = loop.call_later(self._cache_flush_interval_seconds, self._on_flush_timer)
+            self._flush_timer_loop = loop
+    
+    def _start_search_cache_flush(self):
+        """
+        Write a snapshot of the search cache to disk in a background thread.
+        """
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        
+        # Snapshot on the event loop so the thread never sees a dict being mutated
+        snapshot = dict(self.search_cache)
+        self._dirty_count = 0
+        self._last_flush = time.time()
+        self._flush_task = asyncio.create_task(asyncio.to_thread(self._save_search_cache, snapshot))
+    
+    def _on_flush_timer(self):
+        """
+        Flush the updates still pending when the flush interval runs out.
+        """
+        self._flush_timer = None
+        if not self._dirty_count:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            # Try again once the write in flight has had time to finish
+            self._flush_timer = self._flush_timer_loop.call_later(self._cache_flush_interval_seconds, self._on_flush_timer)
+            return
+        self._start_search_cache_flush()
     
-    def _save_search_cache(self):
+    def _load_signing_key(self):
         """
-        Save search cache to file.
+        Load the Apple Music private key used to sign developer tokens.
+        
+        Returns:
+            Private key object, the raw PEM string if it can't be parsed,
+            or None if no key is configured
         """
+        if not self.private_key:
+            return None
+        
         try:
-            with open(self.search_cache_file, 'w') as f:
-                json.dump(self.search_cache, f)
+            return serialization.load_pem_private_key(self.private_key.encode(), password=None)
         except Exception as e:
-            logger.error(f"Error saving search cache: {str(e)}")
+            logger.warning("Could not pre-load Apple Music private key: %s", e)
+            return self.private_key
     
     def _generate_developer_token(self):
         """
@@ -102,14 +282,14 @@ class AppleMusicAgent:
             return None
         
         # Set token expiration to 15 minutes from now
-        expiration_time = datetime.now() + timedelta(minutes=15)
-        self._token_expiration = expiration_time
+        issued_at = int(time.time())
+        expiration_time = issued_at + 15 * 60
         
         # Prepare the token payload
         payload = {
             'iss': self.team_id,
-            'iat': int(time.time()),
-            'exp': int(expiration_time.timestamp()),
+            'iat': issued_at,
+            'exp': expiration_time,
             'sub': 'daily-meditation-app' # Your app identifier
         }
         
@@ -117,7 +297,7 @@ class AppleMusicAgent:
             # Create the JWT token
             token = jwt.encode(
                 payload,
-                self.private_key,
+                self._signing_key,
                 algorithm='ES256',
                 headers={
                     'kid': self.key_id,
@@ -125,9 +305,11 @@ class AppleMusicAgent:
                 }
             )
             
+            # Consider the token expired slightly early to avoid using it at the boundary
+            self._token_expiration = expiration_time - self._token_expiry_skew_seconds
             return token
         except Exception as e:
-            logger.error(f"Error generating developer token: {str(e)}")
+            logger.error("Error generating developer token: %s", e)
             return None
     
     def _get_developer_token(self):
@@ -137,12 +319,38 @@ class AppleMusicAgent:
         Returns:
             String containing the developer token
         """
-        # Check if token is expired or not generated yet
-        if not self._developer_token or not self._token_expiration or datetime.now() >= self._token_expiration:
-            self._developer_token = self._generate_developer_token()
+        # Reuse the cached token while it is still valid
+        if self._developer_token and self._token_expiration and time.time() < self._token_expiration:
+            return self._developer_token
         
+        self._developer_token = self._generate_developer_token()
+        self._refresh_auth_header()
         return self._developer_token
     
+    def _refresh_auth_header(self):
+        """
+        Update the shared client's Authorization header with the current developer token.
+        """
+        if self._client is not None and self._developer_token:
+            self._client.headers['Authorization'] = f'Bearer {self._developer_token}'
+    
+    async def _get_client(self):
+        """
+        Get the shared HTTP client, creating it on first use.
+        
+        Returns:
+            httpx.AsyncClient reused for all Apple Music API requests
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=APPLE_MUSIC_API_URL,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=10, max_connections=10, keepalive_expiry=300),
+                timeout=httpx.Timeout(10.0, connect=5.0)
+            )
+            self._refresh_auth_header()
+        return self._client
+    
     async def _search_apple_music(self, query, limit=20, types=None):
         """
         Search Apple Music for tracks matching the query.
@@ -167,34 +375,32 @@ class AppleMusicAgent:
         
         # Prepare the API endpoint
         types_str = ','.join(types)
-        url = f"https://api.music.apple.com/v1/catalog/us/search"
         params = {
             'term': query,
             'limit': limit,
-            'types': types_str
-        }
-        
-        headers = {
-            'Authorization': f'Bearer {token}'
+            'types': types_str,
+            # Only request the song attributes we use to keep the response small
+            'fields[songs]': _SONG_FIELDS
         }
         
         try:
-            # Make the API request
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                
-                if response.status_code == 200:
-                    logger.info(f"Apple Music search successful for query: {query}")
-                    return response.json()
-                else:
-                    logger.error(f"Apple Music search failed: {response.status_code} - {response.text}")
-                    return None
-                
+            # Make the API request (the client carries the Authorization header)
+            client = await self._get_client()
+            async with self._search_semaphore:
+                response = await client.get('/v1/catalog/us/search', params=params)
+            
+            if response.status_code == 200:
+                logger.info("Apple Music search successful for query: %s", query)
+                return _json_loads(response.content)
+            else:
+                logger.error("Apple Music search failed: %s - %s", response.status_code, response.text)
+                return None
+            
         except Exception as e:
-            logger.error(f"Error searching Apple Music: {str(e)}")
+            logger.error("Error searching Apple Music: %s", e)
             return None
     
-    async def _filter_meditation_tracks(self, search_results):
+    def _filter_meditation_tracks(self, search_results):
         """
         Filter search results to find suitable meditation tracks (8-15 minutes).
         
@@ -214,20 +420,17 @@ class AppleMusicAgent:
             return filtered_tracks
         
         # Process each track
-        for track in search_results['results']['songs']['data']:
-            try:
-                # Check duration (8-15 minutes = 480000-900000 milliseconds)
-                duration_ms = track['attributes'].get('durationInMillis', 0)
-                
-                if 480000 <= duration_ms <= 900000:
-                    # Check if the track has been recently used
-                    if track['id'] not in self.recently_used_tracks:
-                        filtered_tracks.append(track)
-            except Exception as e:
-                logger.error(f"Error processing track: {str(e)}")
-                continue
+        for track in search_results['results']['songs'].get('data', []):
+            # Check duration (8-15 minutes = 480000-900000 milliseconds)
+            duration_ms = track.get('attributes', {}).get('durationInMillis') or 0
+            
+            if 480000 <= duration_ms <= 900000:
+                # Skip tracks without an ID or that have been recently used
+                track_id = track.get('id')
+                if track_id is not None and track_id not in self._recent_ids:
+                    filtered_tracks.append(track)
         
-        logger.info(f"Found {len(filtered_tracks)} suitable meditation tracks")
+        logger.info("Found %s suitable meditation tracks", len(filtered_tracks))
         return filtered_tracks
     
     async def find_meditation(self, mood, language="english"):
@@ -245,74 +448,148 @@ class AppleMusicAgent:
         cache_key = f"{mood}_{language}"
         
         # Check if we have cached results for this mood and language
-        if cache_key in self.search_cache and self.search_cache[cache_key]:
-            logger.info(f"Using cached Apple Music results for mood: {mood}, language: {language}")
+        cached_tracks = self._cache_get(cache_key)
+        if cached_tracks:
+            logger.info("Using cached Apple Music results for mood: %s, language: %s", mood, language)
             
-            # Avoid returning the same tracks consecutively
-            available_tracks = [track for track in self.search_cache[cache_key] 
-                               if track['id'] not in self.recently_used_tracks]
+            # Select a random track, avoiding the same tracks consecutively
+            selected_track = self._pick_unused(cached_tracks)
             
             # If all tracks have been recently used, reset and use all
-            if not available_tracks:
+            if selected_track is None:
                 logger.info("All cached tracks have been recently used, resetting filter")
-                available_tracks = self.search_cache[cache_key]
+                selected_track = random.choice(cached_tracks)
             
-            # Select a random track
-            if available_tracks:
-                selected_track = random.choice(available_tracks)
-                
-                # Add to recently used tracks (limit to last 5)
-                self.recently_used_tracks.append(selected_track['id'])
-                if len(self.recently_used_tracks) > 5:
-                    self.recently_used_tracks.pop(0)
-                
-                return self._prepare_track_response(selected_track)
-        
-        # Get appropriate search queries for this mood
-        if mood in self.mood_to_query:
-            queries = self.mood_to_query[mood]
-        else:
-            # Default queries if mood isn't in our predefined list
-            queries = ["meditation music", "mindfulness meditation", "relaxing music"]
+            # Add to recently used tracks
+            self._mark_track_used(selected_track['id'])
+            
+            return self._prepare_track_response(selected_track)
         
-        # Add language to queries if it's not English
-        if language.lower() != "english":
-            queries = [f"{query} {language}" for query in queries]
+        # Get appropriate search queries for this mood and language
+        queries = _queries_for(mood, language)
         
-        # Try Apple Music search with our queries
-        all_tracks = []
+        # Search Apple Music for suitable tracks, sharing the search with any
+        # concurrent caller that is already looking up the same mood and language
+        search_task = self._inflight.get(cache_key)
+        if search_task is None:
+            search_task = asyncio.create_task(self._search_and_cache(cache_key, queries))
+            self._inflight[cache_key] = search_task
+            search_task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
         
-        for query in queries:
-            logger.info(f"Searching Apple Music with query: {query}")
-            search_results = await self._search_apple_music(query)
-            
-            if search_results:
-                # Filter suitable meditation tracks
-                filtered_tracks = await self._filter_meditation_tracks(search_results)
-                all_tracks.extend(filtered_tracks)
-            
-            await asyncio.sleep(0.5)  # Small delay between requests
+        # Shield the shared search so one cancelled caller doesn't cancel it for the others
+        all_tracks = await asyncio.shield(search_task)
         
         # If we found suitable tracks
         if all_tracks:
-            # Cache the results for future use
-            self.search_cache[cache_key] = all_tracks
-            self._save_search_cache()
-            
-            # Select a random track
-            selected_track = random.choice(all_tracks)
+            # Select a random track (each caller picks its own, avoiding tracks
+            # another caller sharing this search has just been given)
+            selected_track = self._pick_unused(all_tracks) or random.choice(all_tracks)
             
-            # Add to recently used tracks (limit to last 5)
-            self.recently_used_tracks.append(selected_track['id'])
-            if len(self.recently_used_tracks) > 5:
-                self.recently_used_tracks.pop(0)
+            # Add to recently used tracks
+            self._mark_track_used(selected_track['id'])
             
             return self._prepare_track_response(selected_track)
         
         # If no suitable tracks found, use a fallback
-        logger.warning(f"No suitable Apple Music meditation tracks found for {mood}")
+        logger.warning("No suitable Apple Music meditation tracks found for %s", mood)
         return (None, None)
     
+    async def _search_and_cache(self, cache_key, queries):
+        """
+        Search Apple Music for suitable tracks and cache them under the given key.
+        
+        Args:
+            cache_key: Cache key for the mood and language
+            queries: Search queries to run
+            
+        Returns:
+            List of distinct suitable meditation tracks
+        """
+        all_tracks = await self._search_meditation_tracks(queries)
+        
+        if all_tracks:
+            # Cache the results for future use
+            self._cache_put(cache_key, all_tracks)
+            self._schedule_search_cache_flush()
+        
+        return all_tracks
+    
+    async def _search_meditation_tracks(self, queries):
+        """
+        Run the Apple Music searches concurrently and collect suitable tracks,
+        stopping early once enough distinct tracks have been found.
+        
+        Args:
+            queries: Search queries to run
+            
+        Returns:
+            List of distinct suitable meditation tracks
+        """
+        logger.info("Searching Apple Music with queries: %s", queries)
+        tasks = [asyncio.create_task(self._search_apple_music(query)) for query in queries]
+        
+        # Key tracks by ID so results matching more than one query are kept once
+        tracks_by_id = {}
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                try:
+                    search_results = await next_result
+                except Exception as e:
+                    logger.error("Error searching Apple Music: %s", e)
+                    continue
+                
+                if search_results:
+                    for track in self._filter_meditation_tracks(search_results):
+                        tracks_by_id.setdefault(track['id'], track)
+                
+                # No need to wait for the remaining searches once we have enough tracks
+                if len(tracks_by_id) >= self.enough_tracks:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return list(tracks_by_id.values())
+    
+    def _pick_unused(self, tracks):
+        """
+        Pick a random track that hasn't been recently used, in a single pass
+        without building a filtered copy of the list (reservoir sampling).
+        
+        Args:
+            tracks: List of Apple Music tracks
+            
+        Returns:
+            A randomly selected track, or None if all tracks were recently used
+        """
+        chosen = None
+        count = 0
+        for track in tracks:
+            if track['id'] in self._recent_ids:
+                continue
+            count += 1
+            if random.random() * count < 1:
+                chosen = track
+        return chosen
+    
+    def _mark_track_used(self, track_id):
+        """
+        Record a track as recently used, evicting the oldest entry when full.
+        
+        Args:
+            track_id: Apple Music track ID
+        """
+        evicted = None
+        if len(self.recently_used_tracks) == self.recently_used_tracks.maxlen:
+            evicted = self.recently_used_tracks[0]
+        
+        self.recently_used_tracks.append(track_id)
+        self._recent_ids.add(track_id)
+        
+        # Only forget the evicted ID if it isn't still in the window
+        if evicted is not None and evicted not in self.recently_used_tracks:
+            self._recent_ids.discard(evicted)
+    
     def _prepare_track_response(self, track):
         """
         Prepare the track response from Apple Music data.
@@ -377,32 +654,45 @@ class AppleMusicAgent:
             return []
         
         # Prepare the API endpoint
-        url = f"https://api.music.apple.com/v1/catalog/us/songs/{track_id}/recommendations"
         params = {
             'limit': limit
         }
         
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
-        
         try:
-            # Make the API request
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                
-                if response.status_code == 200:
-                    logger.info(f"Apple Music recommendations retrieved for track: {track_id}")
-                    result = response.json()
-                    
-                    # Process and return the recommendations
-                    if 'data' in result:
-                        return result['data']
-                    return []
-                else:
-                    logger.error(f"Apple Music recommendations failed: {response.status_code} - {response.text}")
-                    return []
+            # Make the API request (the client carries the Authorization header)
+            client = await self._get_client()
+            response = await client.get(f'/v1/catalog/us/songs/{track_id}/recommendations', params=params)
+            
+            if response.status_code == 200:
+                logger.info("Apple Music recommendations retrieved for track: %s", track_id)
+                result = _json_loads(response.content)
                 
+                # Process and return the recommendations
+                if 'data' in result:
+                    return result['data']
+                return []
+            else:
+                logger.error("Apple Music recommendations failed: %s - %s", response.status_code, response.text)
+                return []
+            
         except Exception as e:
-            logger.error(f"Error getting Apple Music recommendations: {str(e)}")
-            return [] 
\ No newline at end of file
+            logger.error("Error getting Apple Music recommendations: %s", e)
+            return [] 
+    
+    async def aclose(self):
+        """
+        Flush pending search cache updates and close the shared HTTP client.
+        """
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        if self._dirty_count:
+            await asyncio.to_thread(self._save_search_cache)
+            self._dirty_count = 0
+        
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
\ No newline at end of file
@@ -8,10 +8,14 @@ import aiohttp
 import asyncio
 import logging
 import hashlib
+import json
+import re
+import shutil
+import functools
 import tempfile
+import time
 from pathlib import Path
 from urllib.parse import urlparse, unquote
-import requests
 import random
 from pytube import YouTube
 
@@ -19,18 +23,184 @@ from pytube import YouTube
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# A basic valid MP3 made of silent frames (more likely to be recognized as valid audio),
+# repeated 50 times (~40KB) to pass minimum size checks. Built once at import time.
+_SILENT_MP3 = bytes.fromhex(
+    # MP3 header + minimal LAME tag
+    'FFFB90640000000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    # Repeat many frames to make a larger file
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
+) * 50
+
+# Known audio file signatures at the start of a file: MP3 (ID3 tag or MPEG sync),
+# WAV (RIFF....WAVE), OGG (OggS) and M4A/AAC (ftyp box within the first 12 bytes)
+_AUDIO_HEADER_RE = re.compile(rb'ID3|\xFF[\xFB\xFA]|RIFF.{4}WAVE|OggS|.{0,8}ftyp', re.DOTALL)
+
+# MPEG frame sync words, searched for deeper in files without a known header
+_MP3_SYNC_RE = re.compile(rb'\xFF[\xFB\xFA]')
+
+def _write_all(fd, data):
+    """
+    Write a whole buffer to a file descriptor, retrying after short writes.
+    
+    Args:
+        fd: File descriptor to write to
+        data: Bytes-like object to write
+    """
+    with memoryview(data) as view:
+        while view:
+            written = os.writev(fd, [view])
+            view = view[written:]
+
+def _sniff_audio_uncached(file_path):
+    """
+    Look for audio signatures in a file.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        True if the file appears to be an audio file, False otherwise
+    """
+    # Check for common audio file signatures
+    try:
+        with open(file_path, 'rb') as f:
+            # Read the first 12 bytes
+            header = f.read(12)
+            
+            # Check for common audio file signatures in one compiled match
+            if _AUDIO_HEADER_RE.match(header) is not None:
+                return True
+            
+            # No known header: read more of the file to look for audio markers.
+            # Continue from where the header read stopped and keep its bytes
+            # so a sync word straddling the boundary is still found.
+            content = header + f.read(4096 - len(header))  # Read 4KB in total
+            
+            # Look for MP3 frame headers deeper in the file
+            return _MP3_SYNC_RE.search(content) is not None
+    except Exception as e:
+        logger.error(f"Error checking if file is audio: {str(e)}")
+        return False
+
+@functools.lru_cache(maxsize=1024)
+def _sniff_audio(file_path, mtime_ns, size):
+    """
+    Look for audio signatures in a file, cached by path, mtime and size.
+    
+    Args:
+        file_path: Path to the file
+        mtime_ns: Modification time of the file (part of the cache key)
+        size: Size of the file (part of the cache key)
+        
+    Returns:
+        True if the file appears to be an audio file, False otherwise
+    """
+    return _sniff_audio_uncached(file_path)
+
+# One HTTP session shared by every downloader in the process, so pooled
+# connections and cached DNS lookups survive across agent instances. A session
+# only works on the event loop it was created on, so that loop is kept with it.
+_SESSION = None
+_SESSION_LOOP = None
+_SESSION_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': '*/*',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/',
+    'DNT': '1'
+}
+
+# Alternate browser headers for retrying a download that was refused with a 403
+_FALLBACK_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36 Edg/115.0.1901.183',
+    'Accept': '*/*',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/',
+    'DNT': '1'
+}
+
+async def _get_session():
+    """
+    Get the process-wide HTTP session, creating it on first use.
+    
+    A session left over from a previous event loop (e.g. an earlier asyncio.run)
+    is dropped and a new one is created for the running loop.
+    
+    Returns:
+        aiohttp.ClientSession with a pooled connector
+    """
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is not None and _SESSION_LOOP is not loop:
+        # Its connections belong to the other loop and can't be closed from here;
+        # detaching marks the session closed without touching them
+        _SESSION.detach()
+        _SESSION = None
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(
+            limit=128,
+            limit_per_host=8,
+            ttl_dns_cache=600,
+            enable_cleanup_closed=True,
+            keepalive_timeout=60
+        )
+        _SESSION = aiohttp.ClientSession(headers=_SESSION_HEADERS, connector=connector)
+        _SESSION_LOOP = loop
+    return _SESSION
+
+async def close_session():
+    """
+    Close the process-wide HTTP session if it belongs to the running loop.
+    
+    Every AudioDownloaderAgent shares this session, so it is closed once at
+    process shutdown rather than by any single agent.
+    """
+    global _SESSION, _SESSION_LOOP
+    if _SESSION is not None and _SESSION_LOOP is asyncio.get_running_loop():
+        session, _SESSION, _SESSION_LOOP = _SESSION, None, None
+        await session.close()
+
+class _DownloadFailed(Exception):
+    """A download that failed for good (no retry), with the reason as its message."""
+
+@functools.lru_cache(maxsize=4096)
+def _url_digest(url):
+    """Short, non-cryptographic digest of a URL used to keep cached filenames unique."""
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+
 class AudioDownloaderAgent:
     """
     Agent for downloading meditation audio files from the web.
     Handles downloading, caching, and error handling.
     """
     
-    def __init__(self, cache_dir=None):
+    def __init__(self, cache_dir=None, on_unavailable=None):
         """
         Initialize the audio downloader agent.
         
         Args:
             cache_dir: Directory to cache downloaded audio files
+            on_unavailable: Optional callback called with a URL the server reports
+                as gone (404/410), e.g. AudioRetrieverAgent.mark_unavailable
         """
         if cache_dir is None:
             self.cache_dir = Path(__file__).parent.parent / "assets" / "cached_audio"
@@ -40,8 +210,35 @@ class AudioDownloaderAgent:
         # Create cache directory if it doesn't exist
         os.makedirs(self.cache_dir, exist_ok=True)
         
-        # Initialize HTTP session attributes (will be created when needed)
-        self.session = None
+        # Content hashes of files we downloaded and validated ourselves, so
+        # cache hits on them can be trusted without re-reading the file
+        self.content_digests_file = self.cache_dir / "cache_index.json"
+        self._content_digests = self._load_content_digests()
+        
+        # Debounce index writes: flush after this many updates or this many seconds,
+        # with at most one flush in flight so an older snapshot can't land last
+        self._digests_flush_every = 8
+        self._digests_flush_interval_seconds = 30
+        self._digests_dirty_count = 0
+        self._digests_last_flush = 0.0
+        self._digests_flush_task = None
+        
+        # Timer that writes the tail of a burst once it goes quiet, and the loop it runs on
+        self._digests_flush_timer = None
+        self._digests_flush_timer_loop = None
+        
+        # Told about URLs that are gone, so whoever supplied them can skip them
+        self.on_unavailable = on_unavailable
+        
+        # Download concurrency limits and retry policy
+        self.max_attempts = 4
+        self.max_retry_after_seconds = 30
+        self.max_downloads_per_host = 4
+        self._download_semaphore = asyncio.Semaphore(8)
+        self._host_semaphores = {}
+        
+        # Whether unnamed O_TMPFILE scratch files can be linked into the cache
+        self._scratch_linkable = True
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': '*/*',
@@ -64,89 +261,276 @@ class AudioDownloaderAgent:
         
         # Create a filename based on the URL and parameters
         filename = self._generate_filename(url, mood, language)
-        file_path = self.cache_dir / filename
+        file_path = self._cache_path_for(filename)
         
-        # Check if file already exists in cache
-        if file_path.exists():
+        # Check if the file is already cached, in a single worker-thread hop
+        trusted = filename in self._content_digests
+        cached = await asyncio.to_thread(self._check_cached_file, file_path, trusted)
+        if cached:
             logger.info(f"File already exists in cache: {file_path}")
             return str(file_path)
+        if cached is None and trusted:
+            # The file was deleted or evicted, so its content hash no longer vouches for anything
+            logger.warning(f"Cached file has disappeared, downloading again: {file_path}")
+            self._content_digests.pop(filename, None)
+            self._schedule_content_digests_flush()
+        elif cached is False:
+            logger.warning(f"Cached file is not valid audio, downloading again: {file_path}")
+            await asyncio.to_thread(os.unlink, file_path)
+        
+        # Make sure the shard directory exists before anything is written to it
+        file_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Check if this is a YouTube URL
         if 'youtube.com' in url or 'youtu.be' in url:
             logger.info("Detected YouTube URL, using pytube for download")
             return await self._download_from_youtube(url, file_path, mood, language)
         
-        # Create a session if we don't have one
-        if self.session is None:
-            # Rotate user agents to avoid being blocked
-            headers = {
-                'User-Agent': f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(90, 115)}.0.{random.randint(4000, 6000)}.{random.randint(10, 250)} Safari/537.36',
-                'Accept': '*/*',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.google.com/',
-                'DNT': '1'
-            }
-            self.session = aiohttp.ClientSession(headers=headers)
+        # Retry transient failures with exponential backoff, bounding how many
+        # downloads run at once overall and against any single host
+        host = urlparse(url).hostname or ''
+        last_error = None
+        for attempt in range(self.max_attempts):
+            try:
+                async with self._download_semaphore, self._host_semaphore(host):
+                    return await self._download_with_aiohttp(url, file_path, mood, language)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                logger.warning(f"Download attempt {attempt + 1}/{self.max_attempts} failed: {str(e) or type(e).__name__}")
+                if attempt < self.max_attempts - 1:
+                    await asyncio.sleep(self._retry_delay(e, attempt))
+            except _DownloadFailed as e:
+                # Fetch the fallback only now, with this download's slots released
+                return await self._create_error_file(mood, language, str(e))
+            except Exception as e:
+                logger.error(f"Error downloading audio with aiohttp: {str(e)}")
+                return await self._create_error_file(mood, language, str(e))
+        
+        logger.error(f"Giving up on download after {self.max_attempts} attempts")
+        return await self._create_error_file(mood, language, f"Download failed: {str(last_error) or type(last_error).__name__}")
+    
+    def _retry_delay(self, error, attempt):
+        """
+        Work out how long to wait before retrying a failed download.
         
-        try:
-            # Try with aiohttp first
-            async with self.session.get(url, timeout=30, allow_redirects=True) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to download file with aiohttp: HTTP {response.status}")
-                    
-                    # If we get a 403, try again with requests library as a fallback
-                    if response.status == 403:
-                        logger.info("Got 403 with aiohttp, trying with requests as fallback")
-                        return await self._download_with_requests(url, file_path, mood, language)
-                    else:
-                        return await self._create_error_file(mood, language, f"HTTP error {response.status}")
+        Args:
+            error: Exception raised by the failed attempt
+            attempt: Zero-based number of the failed attempt
+            
+        Returns:
+            Delay in seconds: the server's Retry-After (capped) when it sent one,
+            otherwise exponential backoff with jitter
+        """
+        headers = getattr(error, 'headers', None)
+        retry_after = headers.get('Retry-After', '').strip() if headers else ''
+        if retry_after.isdigit():
+            return min(int(retry_after), self.max_retry_after_seconds)
+        return 0.5 * 2 ** attempt + random.random()
+    
+    async def _download_with_aiohttp(self, url, file_path, mood, language, headers=None):
+        """
+        Download a file with the shared aiohttp session.
+        
+        Args:
+            url: URL to download from
+            file_path: Path to save the file
+            mood: Mood of the meditation
+            language: Language of the meditation
+            headers: Optional headers overriding the session defaults
+            
+        Returns:
+            Path to the downloaded file
+            
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: On transient failures worth retrying
+            _DownloadFailed: When the download failed for good; the caller creates
+                the error file once it has released its download slots
+        """
+        # Reuse the shared session so connections are pooled across downloads
+        session = await _get_session()
+        
+        async with session.get(url, headers=headers, timeout=30, allow_redirects=True) as response:
+            if response.status != 200:
+                logger.error(f"Failed to download file with aiohttp: HTTP {response.status}")
                 
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-                    temp_path = temp_file.name
+                # If we get a 403, try once more with a different user agent
+                if response.status == 403 and headers is None:
+                    logger.info("Got 403 with aiohttp, retrying with alternate headers")
+                    response.release()
+                    return await self._download_with_aiohttp(url, file_path, mood, language, headers=_FALLBACK_HEADERS)
                 
-                # Get content type to check if it's actually audio
-                content_type = response.headers.get('Content-Type', '')
-                if not ('audio' in content_type.lower() or 'octet-stream' in content_type.lower()):
-                    logger.warning(f"Content-Type is not audio: {content_type}. URL may not be direct audio.")
+                # Let the source of a URL that is gone know, so it isn't offered again
+                if response.status in (404, 410) and self.on_unavailable is not None:
+                    self.on_unavailable(url)
                 
-                # Write the content to the temporary file
-                with open(temp_path, 'wb') as f:
-                    # Download in chunks to handle large files
-                    chunk_size = 1024 * 8  # 8KB chunks
-                    total_size = 0
-                    
-                    async for chunk in response.content.iter_chunked(chunk_size):
-                        if chunk:
-                            f.write(chunk)
-                            total_size += len(chunk)
+                # Rate limiting and server errors are worth retrying
+                if response.status == 429 or response.status >= 500:
+                    response.raise_for_status()
+                
+                raise _DownloadFailed(f"HTTP error {response.status}")
+            
+            # Stream into a scratch file in the target directory so publishing it is atomic
+            fd, temp_path = self._open_scratch_file(file_path)
+            scratch_path = temp_path or f"/proc/self/fd/{fd}"
+            
+            # Get content type to check if it's actually audio
+            content_type = response.headers.get('Content-Type', '')
+            if not ('audio' in content_type.lower() or 'octet-stream' in content_type.lower()):
+                logger.warning(f"Content-Type is not audio: {content_type}. URL may not be direct audio.")
+            
+            try:
+                # Download in chunks to handle large files, buffering them so the
+                # scratch file is written in 1MB batches from a worker thread
+                chunk_size = 1024 * 64  # 64KB chunks
+                flush_size = 1024 * 1024
+                total_size = 0
+                buffer = bytearray()
+                digest = hashlib.blake2b(digest_size=16)
+                
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if chunk:
+                        buffer += chunk
+                        digest.update(chunk)
+                        total_size += len(chunk)
+                        if len(buffer) >= flush_size:
+                            await asyncio.to_thread(_write_all, fd, buffer)
+                            buffer.clear()
+                
+                if buffer:
+                    await asyncio.to_thread(_write_all, fd, buffer)
                 
                 if total_size == 0:
                     logger.error("Downloaded file is empty")
-                    os.unlink(temp_path)
-                    return await self._create_error_file(mood, language, "Downloaded file is empty")
+                    raise _DownloadFailed("Downloaded file is empty")
                 
-                # Check if the file is actually an audio file
+                # Check if the file is actually an audio file (in a worker thread so
+                # a cold disk doesn't stall the other downloads on the event loop)
                 # We do a basic check here - more thorough checks will be done by the quality checker
-                if not self._is_audio_file(temp_path):
+                # Scratch files are checked once and never memoized: a /proc/self/fd/N
+                # path is reused by later downloads and would hit a stale entry
+                if not await asyncio.to_thread(self._is_audio_file, scratch_path, False):
                     logger.error("Downloaded file is not a valid audio file")
-                    os.unlink(temp_path)
-                    return await self._create_error_file(mood, language, "Not a valid audio file")
-                
-                # Move the temporary file to the cache directory
-                os.rename(temp_path, file_path)
-                logger.info(f"Successfully downloaded audio to {file_path}")
-                
-                return str(file_path)
+                    raise _DownloadFailed("Not a valid audio file")
                 
-        except asyncio.TimeoutError:
-            logger.error("Download timed out with aiohttp")
-            # On timeout, try with requests as fallback
-            return await self._download_with_requests(url, file_path, mood, language)
-        except Exception as e:
-            logger.error(f"Error downloading audio with aiohttp: {str(e)}")
-            # Try with requests as fallback
-            return await self._download_with_requests(url, file_path, mood, language)
+                # Give the scratch file its final name (a cheap metadata call, kept on
+                # the loop so the descriptor can't be closed while it is being linked)
+                self._publish_scratch_file(fd, temp_path, file_path)
+            finally:
+                # Don't leave partial downloads behind when the attempt fails
+                # (synchronous on purpose, the task may already be cancelled)
+                os.close(fd)
+                if temp_path is not None and os.path.exists(temp_path):
+                    os.unlink(temp_path)
+            
+            self._content_digests[file_path.name] = digest.hexdigest()
+            self._schedule_content_digests_flush()
+            logger.info(f"Successfully downloaded audio to {file_path}")
+            
+            return str(file_path)
+    
+    def _open_scratch_file(self, file_path):
+        """
+        Open a scratch file for a download in the directory of its final path.
+        
+        On Linux this is an unnamed O_TMPFILE inode that only appears in the
+        directory once it is linked into place; elsewhere (or on filesystems
+        without O_TMPFILE support) it is a .part file beside the target.
+        
+        Args:
+            file_path: Final path of the downloaded file
+            
+        Returns:
+            Tuple of (file descriptor, temporary path or None for an unnamed file)
+        """
+        flags = os.O_WRONLY | getattr(os, 'O_CLOEXEC', 0)
+        o_tmpfile = getattr(os, 'O_TMPFILE', None)
+        if o_tmpfile is not None and self._scratch_linkable:
+            try:
+                return os.open(file_path.parent, flags | o_tmpfile, 0o644), None
+            except OSError:
+                pass
+        
+        temp_path = f"{file_path}.part"
+        return os.open(temp_path, flags | os.O_CREAT | os.O_TRUNC, 0o644), temp_path
+    
+    def _publish_scratch_file(self, fd, temp_path, file_path):
+        """
+        Atomically give a finished scratch file its final name.
+        
+        Args:
+            fd: File descriptor of the scratch file
+            temp_path: Temporary path of the scratch file, or None if it is unnamed
+            file_path: Final path of the downloaded file
+        """
+        if temp_path is not None:
+            os.replace(temp_path, file_path)
+            return
+        
+        try:
+            os.link(f"/proc/self/fd/{fd}", file_path)
+        except FileExistsError:
+            # A concurrent download of the same URL already published it
+            pass
+        except OSError as e:
+            # Linking through /proc isn't permitted everywhere (e.g. some sandboxes),
+            # so copy this one out and use named scratch files from now on
+            logger.warning(f"Could not link unnamed scratch file, using .part files instead: {str(e)}")
+            self._scratch_linkable = False
+            temp_path = f"{file_path}.part"
+            shutil.copyfile(f"/proc/self/fd/{fd}", temp_path)
+            os.replace(temp_path, file_path)
+    
+    def _host_semaphore(self, host):
+        """
+        Get the semaphore limiting concurrent downloads from a single host.
+        
+        Args:
+            host: Hostname of the download URL
+            
+        Returns:
+            asyncio.Semaphore for the host
+        """
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_downloads_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def download_many(self, items, then=None):
+        """
+        Download several audio files concurrently.
+        
+        Each item runs as its own task, so when a follow-up step is given
+        (e.g. mixing) it starts as soon as that item's download finishes,
+        overlapping with the downloads still in progress.
+        
+        Args:
+            items: Iterable of (url, mood, language) tuples
+            then: Optional coroutine function called with each downloaded path
+            
+        Returns:
+            List of results in the same order as items (downloaded paths, or
+            the results of `then` when provided)
+            
+        Raises:
+            Exception: The first error raised by an item; the items still
+                running are cancelled first
+        """
+        async def pipeline(url, mood, language):
+            path = await self.download_audio(url, mood, language)
+            if then is not None:
+                return await then(path)
+            return path
+        
+        tasks = [asyncio.create_task(pipeline(url, mood, language)) for url, mood, language in items]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other downloads and mixes running unobserved
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
     
     async def _download_from_youtube(self, url, file_path, mood, language):
         """
@@ -236,69 +620,143 @@ class AudioDownloaderAgent:
             logger.error(f"Error in YouTube download: {str(e)}")
             return False
     
-    async def _download_with_requests(self, url, file_path, mood, language):
+    def _check_cached_file(self, file_path, trusted):
         """
-        Fallback download method using the requests library.
+        Check whether a cached download can be used (runs in a worker thread).
         
         Args:
-            url: URL to download from
-            file_path: Path to save the file
-            mood: Mood of the meditation
-            language: Language of the meditation
+            file_path: Path of the cached file
+            trusted: Whether the file's content hash was recorded when we downloaded it
             
         Returns:
-            Path to the downloaded file or error file
+            None if the file doesn't exist, otherwise True if it can be used
+            (trusted, or it looks like audio) and False if it can't
         """
-        logger.info(f"Attempting fallback download with requests: {url}")
         try:
-            # Use a different user agent to avoid being blocked
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36 Edg/115.0.1901.183',
-                'Accept': '*/*',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.google.com/',
-                'DNT': '1'
-            }
-            
-            # Stream the download to handle large files
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to download file with requests: HTTP {response.status_code}")
-                return await self._create_error_file(mood, language, f"HTTP error {response.status_code}")
-            
-            # Create a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-                temp_path = temp_file.name
-            
-            # Write the content to the temporary file
-            total_size = 0
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        total_size += len(chunk)
-            
-            if total_size == 0:
-                logger.error("Downloaded file is empty")
-                os.unlink(temp_path)
-                return await self._create_error_file(mood, language, "Downloaded file is empty")
-            
-            # Check if the file is actually an audio file
-            if not self._is_audio_file(temp_path):
-                logger.error("Downloaded file is not a valid audio file")
-                os.unlink(temp_path)
-                return await self._create_error_file(mood, language, "Not a valid audio file")
-            
-            # Move the temporary file to the cache directory
-            os.rename(temp_path, file_path)
-            logger.info(f"Successfully downloaded audio with requests to {file_path}")
-            
-            return str(file_path)
-            
+            if trusted:
+                os.stat(file_path)
+                return True
+            return self._is_audio_file(file_path)
+        except FileNotFoundError:
+            pass
+        
+        # Caches written before sharding keep their files directly in cache_dir,
+        # so move a flat copy into its shard the first time it is looked up
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(self.cache_dir / file_path.name, file_path)
+        except FileNotFoundError:
+            return None
+        logger.info(f"Moved cached file into its shard: {file_path}")
+        return trusted or self._is_audio_file(file_path)
+    
+    def _load_content_digests(self):
+        """
+        Load the content hashes of previously downloaded files.
+        
+        Returns:
+            Dictionary mapping cached filenames to their BLAKE2b content hashes
+        """
+        try:
+            with open(self.content_digests_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
         except Exception as e:
-            logger.error(f"Error downloading audio with requests: {str(e)}")
-            return await self._create_error_file(mood, language, str(e))
+            logger.error(f"Error loading cache index: {str(e)}")
+            return {}
+    
+    def _save_content_digests(self, digests=None):
+        """
+        Atomically write the content hashes of downloaded files to disk.
+        
+        Args:
+            digests: Snapshot of the filename -> content hash mapping
+                (defaults to the current mapping)
+        """
+        if digests is None:
+            digests = dict(self._content_digests)
+        
+        tmp_name = None
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                tmp_name = f.name
+                json.dump(digests, f)
+            os.replace(tmp_name, self.content_digests_file)
+        except Exception as e:
+            logger.error(f"Error saving cache index: {str(e)}")
+            # Don't leave half-written temp files in the cache directory
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+    
+    def _schedule_content_digests_flush(self):
+        """
+        Record an index update and flush to disk in a background thread once
+        enough updates have accumulated or enough time has passed.
+        
+        Updates that aren't flushed right away are written by a timer after
+        the flush interval, so the tail of a burst isn't lost.
+        """
+        self._digests_dirty_count += 1
+        
+        due = (self._digests_dirty_count >= self._digests_flush_every or
+               time.time() - self._digests_last_flush > self._digests_flush_interval_seconds)
+        if due and (self._digests_flush_task is None or self._digests_flush_task.done()):
+            self._start_content_digests_flush()
+            return
+        
+        loop = asyncio.get_running_loop()
+        if self._digests_flush_timer is None or self._digests_flush_timer_loop is not loop:
+            self._digests_flush_timer = loop.call_later(self._digests_flush_interval_seconds, self._on_digests_flush_timer)
+            self._digests_flush_timer_loop = loop
+    
+    def _start_content_digests_flush(self):
+        """
+        Write a snapshot of the index to disk in a background thread.
+        """
+        if self._digests_flush_timer is not None:
+            self._digests_flush_timer.cancel()
+            self._digests_flush_timer = None
+        
+        # Snapshot on the event loop so the thread never sees a dict being mutated
+        snapshot = dict(self._content_digests)
+        self._digests_dirty_count = 0
+        self._digests_last_flush = time.time()
+        self._digests_flush_task = asyncio.create_task(asyncio.to_thread(self._save_content_digests, snapshot))
+    
+    def _on_digests_flush_timer(self):
+        """
+        Flush the index updates still pending when the flush interval runs out.
+        """
+        self._digests_flush_timer = None
+        if not self._digests_dirty_count:
+            return
+        if self._digests_flush_task is not None and not self._digests_flush_task.done():
+            # Try again once the write in flight has had time to finish
+            self._digests_flush_timer = self._digests_flush_timer_loop.call_later(
+                self._digests_flush_interval_seconds, self._on_digests_flush_timer)
+            return
+        self._start_content_digests_flush()
+    
+    def _cache_path_for(self, filename):
+        """
+        Get the sharded cache path for a downloaded file.
+        
+        Files are spread over two levels of subdirectories named after a hash
+        of the filename (e.g. cache_dir/3f/a2/<filename>) so no single
+        directory grows large enough to slow down lookups.
+        
+        Args:
+            filename: Name of the cached file
+            
+        Returns:
+            Path to the file inside its shard directory
+        """
+        shard = hashlib.sha1(filename.encode()).hexdigest()
+        return self.cache_dir / shard[:2] / shard[2:4] / filename
     
     def _generate_filename(self, url, mood, language):
         """
@@ -319,17 +777,16 @@ class AudioDownloaderAgent:
         
         # Create a base filename
         base_filename = f"{mood}_{language}"
+        url_hash = _url_digest(url)
         
         # If URL has a recognizable audio filename, use parts of it
         if url_filename and '.' in url_filename:
             name, ext = os.path.splitext(url_filename)
             if ext.lower() in ['.mp3', '.wav', '.m4a', '.ogg']:
                 # Hash part of the URL to keep it unique but readable
-                url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-                return f"{base_filename}_{name[:20]}_{url_hash}{ext.lower()}"
+                return f"{base_filename}_{name[:20]}_{url_hash[:8]}{ext.lower()}"
         
         # Fallback to a hash-based filename
-        url_hash = hashlib.md5(url.encode()).hexdigest()
         return f"{base_filename}_{url_hash}.mp3"
     
     async def _create_error_file(self, mood, language, error_message):
@@ -356,61 +813,31 @@ class AudioDownloaderAgent:
         logger.info(f"Created error file: {error_path}")
         
         # Return path to a fallback audio file
-        return self._get_fallback_audio_path(mood, language)
+        return await self._get_fallback_audio_path(mood, language)
     
-    def _is_audio_file(self, file_path):
+    def _is_audio_file(self, file_path, memoize=True):
         """
         Basic check to see if a file is an audio file.
         
         Args:
             file_path: Path to the file
+            memoize: Whether the result may be cached by path, mtime and size
             
         Returns:
             True if the file appears to be an audio file, False otherwise
         """
         # Check file size first
-        file_size = os.path.getsize(file_path)
-        if file_size < 1024:  # Less than 1KB is suspicious
+        stat = os.stat(file_path)
+        if stat.st_size < 1024:  # Less than 1KB is suspicious
             return False
         
-        # Check for common audio file signatures
-        try:
-            with open(file_path, 'rb') as f:
-                # Read the first 12 bytes
-                header = f.read(12)
-                
-                # Check for common audio file signatures
-                # MP3: ID3 header or MPEG sync
-                if header.startswith(b'ID3') or header[0:2] in [b'\xFF\xFB', b'\xFF\xFA']:
-                    return True
-                
-                # WAV: RIFF header
-                if header.startswith(b'RIFF') and b'WAVE' in header:
-                    return True
-                
-                # M4A/AAC: ftyp header
-                if b'ftyp' in header:
-                    return True
-                
-                # OGG: OggS header
-                if header.startswith(b'OggS'):
-                    return True
-                
-                # Read more of the file to look for audio markers
-                f.seek(0)
-                content = f.read(4096)  # Read 4KB
-                
-                # Look for MP3 frame headers deeper in the file
-                for i in range(len(content) - 2):
-                    if content[i:i+2] in [b'\xFF\xFB', b'\xFF\xFA']:
-                        return True
-                
-            return False
-        except Exception as e:
-            logger.error(f"Error checking if file is audio: {str(e)}")
-            return False
+        if not memoize:
+            return _sniff_audio_uncached(file_path)
+        
+        # Re-checking an unchanged file is answered from the cache
+        return _sniff_audio(str(file_path), stat.st_mtime_ns, stat.st_size)
     
-    def _get_fallback_audio_path(self, mood, language):
+    async def _get_fallback_audio_path(self, mood, language):
         """
         Get the path to a fallback audio file.
         
@@ -443,18 +870,31 @@ class AudioDownloaderAgent:
             
             logger.info(f"Downloading fallback audio from: {fallback_url}")
             
-            # Use requests to download (no need for session here)
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': '*/*'
-            }
-            
-            response = requests.get(fallback_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            # Save the content to our fallback file
-            with open(fallback_path, 'wb') as f:
-                f.write(response.content)
+            # Use the shared session so the event loop isn't blocked while downloading
+            session = await _get_session()
+            async with session.get(fallback_url, timeout=10) as response:
+                response.raise_for_status()
+                
+                # Stream the body into a scratch file that is only published once complete,
+                # so a failed or cut-off download never leaves a partial fallback behind
+                fd, temp_path = self._open_scratch_file(fallback_path)
+                try:
+                    total_size = 0
+                    async for chunk in response.content.iter_chunked(1024 * 1024):
+                        await asyncio.to_thread(_write_all, fd, chunk)
+                        total_size += len(chunk)
+                    
+                    # A dropped connection can end the body early (the length can only be
+                    # compared when the body wasn't compressed in transit)
+                    expected_size = None if 'Content-Encoding' in response.headers else response.content_length
+                    if total_size == 0 or (expected_size is not None and total_size != expected_size):
+                        raise aiohttp.ClientPayloadError(f"Incomplete fallback download: {total_size} of {expected_size} bytes")
+                    
+                    self._publish_scratch_file(fd, temp_path, fallback_path)
+                finally:
+                    os.close(fd)
+                    if temp_path is not None and os.path.exists(temp_path):
+                        os.unlink(temp_path)
             
             logger.info(f"Successfully downloaded fallback audio to {fallback_path}")
             return str(fallback_path)
@@ -465,37 +905,8 @@ class AudioDownloaderAgent:
             # Create a basic valid MP3 file with more silence frames (more likely to be recognized as valid audio)
             # This is a larger valid MP3 file with enough frames of silence
             try:
-                # Create a larger silent MP3 with more frames (more likely to be recognized as valid)
-                silent_mp3 = bytes.fromhex(
-                    # MP3 header + minimal LAME tag
-                    'FFFB90640000000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    # Repeat many frames to make a larger file
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                    'FFFB906400000000000000000000000000000000000000000000000000000000000000000000000000'
-                )
-                
-                # Write a much larger file to pass minimum size checks
-                with open(fallback_path, 'wb') as f:
-                    # Write the silent MP3 data multiple times to make the file larger
-                    for _ in range(50):  # Writing 50 copies makes a ~40KB file
-                        f.write(silent_mp3)
+                # Write the silent MP3 in a single call
+                Path(fallback_path).write_bytes(_SILENT_MP3)
                 
                 logger.info(f"Created valid silent fallback audio file: {fallback_path}")
                 return str(fallback_path)
@@ -507,10 +918,25 @@ class AudioDownloaderAgent:
                 Path(fallback_path).touch()
                 return str(fallback_path)
     
+    async def aclose(self):
+        """
+        Flush pending cache index updates to disk.
+        """
+        if self._digests_flush_timer is not None:
+            self._digests_flush_timer.cancel()
+            self._digests_flush_timer = None
+        if self._digests_flush_task is not None:
+            await self._digests_flush_task
+            self._digests_flush_task = None
+        if self._digests_dirty_count:
+            await asyncio.to_thread(self._save_content_digests)
+            self._digests_dirty_count = 0
+    
     async def close(self):
         """
-        Close the HTTP session.
+        Flush pending cache index updates (kept for callers of the old API).
+        
+        The HTTP session is shared by every downloader and stays open; close it
+        once at process shutdown with close_session().
         """
-        if self.session is not None:
-            await self.session.close()
-            self.session = None 
\ No newline at end of file
+        await self.aclose()
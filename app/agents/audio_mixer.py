@@ -1,8 +1,46 @@
+import asyncio
+import concurrent.futures
+import hashlib
 import os
+import shutil
 import tempfile
+import threading
+import weakref
 from pathlib import Path
 import subprocess
-from pydub import AudioSegment
+
+# pydub is only needed when ffmpeg can't mix directly
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+
+# numpy speeds up the pydub fallback mix with a vectorized sample add
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# ffmpeg binary used to mix in a single pass (falls back to pydub if missing)
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+# Quiet, non-interactive ffmpeg flags: no stdin/TTY probing, no banner, errors only
+_FFMPEG_QUIET_ARGS = ["-nostdin", "-hide_banner", "-loglevel", "error"]
+
+# Worker processes for the CPU-bound pydub fallback, created on first use
+# (ffmpeg mixes run as subprocesses straight from the event loop)
+_MIX_POOL = None
+_MIX_POOL_WORKERS = 2
+
+# Decoded ambient loops are reused across mixes, so keep them as WAV
+_AMBIENT_CACHE_DIR = Path(__file__).parent.parent / "assets" / "cached_audio" / "decoded_ambient"
+
+# One lock per decode key, so concurrent mixes of the same loop decode it once
+# (held weakly, so a key's lock goes away once no decode is using it)
+_AMBIENT_DECODE_LOCKS = weakref.WeakValueDictionary()
+_AMBIENT_DECODE_LOCKS_GUARD = threading.Lock()
 
 class AudioMixerAgent:
     """
@@ -15,89 +53,353 @@ class AudioMixerAgent:
         """
         pass
     
-    async def mix(self, meditation_path: str, ambient_path: str, output_path: str = None) -> str:
+    async def mix(self, meditation_path: str = None, ambient_path: str = None, output_path: str = None,
+                  voice_path: str = None) -> str:
         """
         Mix the meditation audio with the ambient sound to create the final meditation audio.
         
+        With ffmpeg the mix is a single subprocess awaited on the event loop; the
+        pydub fallback runs in a worker process so concurrent mixes don't block it.
+        
         Args:
             meditation_path: Path to the meditation audio file (MP3 or WAV)
-            ambient_path: Path to the ambient sound file (MP3 or WAV)
+            ambient_path: Path to the ambient sound file (MP3 or WAV); without one
+                the meditation audio is copied to the output unchanged
             output_path: Path where the output audio file should be saved (MP3)
+            voice_path: Alias for meditation_path (the narrated voice track)
             
         Returns:
             Path to the generated mixed audio file (MP3)
+            
+        Raises:
+            ValueError: If neither meditation_path nor voice_path is given
         """
+        if meditation_path is None:
+            meditation_path = voice_path
+        if meditation_path is None:
+            raise ValueError("mix() needs a meditation_path (or voice_path) to mix")
+        
         # If no output path is provided, create a temporary file
         if output_path is None:
             with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
                 output_path = temp_file.name
-                
-        print(f"Mixing meditation audio: {meditation_path}")
-        print(f"With ambient sound: {ambient_path}")
-        print(f"Output will be saved to: {output_path}")
         
-        try:
-            # Check if both files exist
-            if not os.path.exists(meditation_path) or not os.path.isfile(meditation_path):
-                print(f"Warning: Meditation audio file does not exist: {meditation_path}")
-                Path(output_path).touch()
-                return output_path
-                
-            if not os.path.exists(ambient_path) or not os.path.isfile(ambient_path):
-                print(f"Warning: Ambient sound file does not exist: {ambient_path}")
-                # If ambient sound doesn't exist but meditation does, just copy the meditation
-                if os.path.exists(meditation_path) and os.path.getsize(meditation_path) > 0:
-                    import shutil
-                    shutil.copy(meditation_path, output_path)
-                else:
-                    Path(output_path).touch()
-                return output_path
-            
-            # Check if files are empty (placeholders)
-            if os.path.getsize(meditation_path) == 0 or os.path.getsize(ambient_path) == 0:
-                print(f"Warning: One or both audio files are empty placeholders")
-                # If meditation file has content, just use that
-                if os.path.getsize(meditation_path) > 0:
-                    import shutil
-                    shutil.copy(meditation_path, output_path)
-                else:
-                    Path(output_path).touch()
+        # Nothing to mix in without an ambient track
+        if ambient_path is None:
+            return await asyncio.to_thread(_copy_meditation, meditation_path, output_path)
+        
+        # Mix in a single ffmpeg pass when possible, reusing the decoded ambient loop
+        if FFMPEG_PATH is not None and await asyncio.to_thread(_inputs_ready, meditation_path, ambient_path):
+            ambient_path = await asyncio.to_thread(_decoded_ambient_path, ambient_path)
+            if await _mix_with_ffmpeg(meditation_path, ambient_path, output_path):
+                print(f"Successfully mixed audio and saved to: {output_path}")
                 return output_path
+        
+        # Missing inputs, no ffmpeg, or ffmpeg failed: handle it in a worker process
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_mix_pool(), _mix_sync, meditation_path, ambient_path, output_path
+        )
+
+def _get_mix_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Get the worker pool for pydub mixes, creating it on first use.
+    
+    Returns:
+        ProcessPoolExecutor with a small fixed number of workers
+    """
+    global _MIX_POOL
+    if _MIX_POOL is None:
+        _MIX_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=_MIX_POOL_WORKERS)
+    return _MIX_POOL
+
+def _inputs_ready(meditation_path: str, ambient_path: str) -> bool:
+    """
+    Check that both input files exist and are not empty placeholders.
+    
+    Args:
+        meditation_path: Path to the meditation audio file
+        ambient_path: Path to the ambient sound file
+        
+    Returns:
+        True if both files can be mixed, False otherwise
+    """
+    try:
+        return os.path.getsize(meditation_path) > 0 and os.path.getsize(ambient_path) > 0
+    except OSError:
+        return False
+
+def _copy_meditation(meditation_path: str, output_path: str) -> str:
+    """
+    Use the meditation audio as the output unchanged (an empty file if it has no content).
+    
+    Args:
+        meditation_path: Path to the meditation audio file
+        output_path: Path where the output audio file should be saved
+        
+    Returns:
+        Path to the output file
+    """
+    # copyfile copies in-kernel with sendfile on Linux and skips the chmod
+    if os.path.exists(meditation_path) and os.path.getsize(meditation_path) > 0:
+        shutil.copyfile(meditation_path, output_path)
+    else:
+        Path(output_path).touch()
+    return output_path
+
+def _mix_sync(meditation_path: str, ambient_path: str, output_path: str) -> str:
+    """
+    Mix the meditation audio with the ambient sound using pydub (runs in a worker process).
+    
+    Also handles missing or empty inputs by copying the meditation track through.
+    
+    Args:
+        meditation_path: Path to the meditation audio file (MP3 or WAV)
+        ambient_path: Path to the ambient sound file (MP3 or WAV)
+        output_path: Path where the output audio file should be saved (MP3)
+        
+    Returns:
+        Path to the generated mixed audio file (MP3)
+    """
+    print(f"Mixing meditation audio: {meditation_path}")
+    print(f"With ambient sound: {ambient_path}")
+    print(f"Output will be saved to: {output_path}")
+    
+    try:
+        # Check if both files exist
+        if not os.path.exists(meditation_path) or not os.path.isfile(meditation_path):
+            print(f"Warning: Meditation audio file does not exist: {meditation_path}")
+            Path(output_path).touch()
+            return output_path
             
-            # Load the audio files
-            meditation = AudioSegment.from_file(meditation_path)
-            ambient = AudioSegment.from_file(ambient_path)
-            
-            # Loop the ambient sound if it's shorter than the meditation track
-            if len(ambient) < len(meditation):
-                loops_needed = (len(meditation) // len(ambient)) + 1
-                ambient = ambient * loops_needed
-            
-            # Trim the ambient sound to match the meditation track length
-            ambient = ambient[:len(meditation)]
-            
-            # Lower the volume of the ambient sound (to -15dB compared to the meditation)
-            ambient = ambient - 15
-            
-            # Mix the two tracks
-            mixed = meditation.overlay(ambient)
-            
-            # Export to MP3
-            mixed.export(output_path, format="mp3")
-            print(f"Successfully mixed audio and saved to: {output_path}")
-            
-        except Exception as e:
-            print(f"Error mixing audio: {str(e)}")
-            # Create a backup plan - if meditation file exists and has content, just use that
-            if os.path.exists(meditation_path) and os.path.getsize(meditation_path) > 0:
-                try:
-                    import shutil
-                    shutil.copy(meditation_path, output_path)
-                    print(f"Fallback: Copied meditation audio to output without mixing")
-                except Exception:
-                    Path(output_path).touch()
+        if not os.path.exists(ambient_path) or not os.path.isfile(ambient_path):
+            print(f"Warning: Ambient sound file does not exist: {ambient_path}")
+            # If ambient sound doesn't exist but meditation does, just copy the meditation
+            return _copy_meditation(meditation_path, output_path)
+        
+        # Check if files are empty (placeholders)
+        if os.path.getsize(meditation_path) == 0 or os.path.getsize(ambient_path) == 0:
+            print(f"Warning: One or both audio files are empty placeholders")
+            # If meditation file has content, just use that
+            if os.path.getsize(meditation_path) > 0:
+                shutil.copyfile(meditation_path, output_path)
             else:
-                # Last resort - create an empty file
                 Path(output_path).touch()
+            return output_path
+        
+        # Reuse the decoded ambient loop instead of decoding the MP3 on every mix
+        ambient_path = _decoded_ambient_path(ambient_path)
+        
+        if not PYDUB_AVAILABLE:
+            raise RuntimeError("Neither ffmpeg nor pydub is available for mixing")
         
-        return output_path 
\ No newline at end of file
+        # Load the audio files
+        meditation = AudioSegment.from_file(meditation_path)
+        if ambient_path.endswith(".wav"):
+            ambient = AudioSegment.from_wav(ambient_path)
+        else:
+            ambient = AudioSegment.from_file(ambient_path)
+        
+        # Loop the ambient sound if it's shorter than the meditation track
+        if len(ambient) < len(meditation):
+            loops_needed = (len(meditation) // len(ambient)) + 1
+            ambient = ambient * loops_needed
+        
+        # Trim the ambient sound to match the meditation track length
+        ambient = ambient[:len(meditation)]
+        
+        # Lower the volume of the ambient sound (to -15dB compared to the meditation)
+        ambient = ambient - 15
+        
+        # Mix the two tracks
+        mixed = _overlay(meditation, ambient)
+        
+        # Export to MP3
+        mixed.export(output_path, format="mp3", parameters=_FFMPEG_QUIET_ARGS)
+        print(f"Successfully mixed audio and saved to: {output_path}")
+        
+    except Exception as e:
+        print(f"Error mixing audio: {str(e)}")
+        # Create a backup plan - if meditation file exists and has content, just use that
+        if os.path.exists(meditation_path) and os.path.getsize(meditation_path) > 0:
+            try:
+                shutil.copyfile(meditation_path, output_path)
+                print(f"Fallback: Copied meditation audio to output without mixing")
+            except Exception:
+                Path(output_path).touch()
+        else:
+            # Last resort - create an empty file
+            Path(output_path).touch()
+    
+    return output_path
+
+def _decoded_ambient_path(ambient_path: str) -> str:
+    """
+    Get a cached WAV decode of the ambient sound, decoding it on first use.
+    
+    The cache key is a hash of the resolved path, size and modification time,
+    so two different loops never share a decode and an edited loop is decoded again.
+    
+    Args:
+        ambient_path: Path to the ambient sound file
+        
+    Returns:
+        Path to the decoded WAV file, or the original path if it can't be decoded
+    """
+    if ambient_path.endswith(".wav"):
+        return ambient_path
+    
+    try:
+        stat = os.stat(ambient_path)
+    except OSError as e:
+        print(f"Could not cache decoded ambient sound, using original: {str(e)}")
+        return ambient_path
+    key = f"{os.path.realpath(ambient_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    cached_path = _AMBIENT_CACHE_DIR / f"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}.wav"
+    if cached_path.exists():
+        return str(cached_path)
+    
+    with _ambient_decode_lock(cached_path.name):
+        # Another thread may have finished the same decode while we waited
+        if cached_path.exists():
+            return str(cached_path)
+        return _decode_ambient(ambient_path, cached_path)
+
+def _ambient_decode_lock(key: str) -> threading.Lock:
+    """
+    Get the lock that serializes decodes of one ambient loop within this process.
+    
+    Args:
+        key: Name of the decoded WAV file in the cache
+        
+    Returns:
+        Lock shared by every caller decoding the same loop
+    """
+    with _AMBIENT_DECODE_LOCKS_GUARD:
+        lock = _AMBIENT_DECODE_LOCKS.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _AMBIENT_DECODE_LOCKS[key] = lock
+        return lock
+
+def _decode_ambient(ambient_path: str, cached_path: Path) -> str:
+    """
+    Decode the ambient sound to WAV and publish it at the cache path.
+    
+    Args:
+        ambient_path: Path to the ambient sound file
+        cached_path: Path where the decoded WAV should be stored
+        
+    Returns:
+        Path to the decoded WAV file, or the original path if it can't be decoded
+    """
+    temp_path = None
+    try:
+        # Decode into a unique temp file so no other decoder (thread or worker) can write into it
+        _AMBIENT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=_AMBIENT_CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        temp_path = Path(temp_name)
+        if FFMPEG_PATH is not None:
+            subprocess.run(
+                [FFMPEG_PATH, *_FFMPEG_QUIET_ARGS, "-y", "-i", ambient_path, "-ac", "2", "-ar", "44100", "-f", "wav", str(temp_path)],
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        elif PYDUB_AVAILABLE:
+            AudioSegment.from_file(ambient_path).export(str(temp_path), format="wav", parameters=_FFMPEG_QUIET_ARGS)
+        else:
+            temp_path.unlink()
+            return ambient_path
+        os.replace(temp_path, cached_path)
+        return str(cached_path)
+    except Exception as e:
+        print(f"Could not cache decoded ambient sound, using original: {str(e)}")
+        if temp_path is not None and temp_path.exists():
+            temp_path.unlink()
+        return ambient_path
+
+def _overlay(meditation, ambient):
+    """
+    Overlay the ambient sound on the meditation audio.
+    
+    With numpy the samples are summed as int32 arrays and clipped back to
+    int16 in one vectorized pass; otherwise pydub's overlay is used.
+    
+    Args:
+        meditation: AudioSegment with the meditation audio
+        ambient: AudioSegment with the (already looped and attenuated) ambient sound
+        
+    Returns:
+        AudioSegment with both tracks mixed, the length of the meditation
+    """
+    if not NUMPY_AVAILABLE:
+        return meditation.overlay(ambient)
+    
+    # Bring both tracks to the same 16-bit sample layout
+    meditation = meditation.set_sample_width(2)
+    ambient = ambient.set_sample_width(2).set_frame_rate(meditation.frame_rate).set_channels(meditation.channels)
+    
+    voice = np.frombuffer(meditation.raw_data, dtype=np.int16).astype(np.int32)
+    background = np.frombuffer(ambient.raw_data, dtype=np.int16).astype(np.int32)
+    
+    # Match the ambient sample count to the meditation (ms trimming can be off by a few frames)
+    if len(background) < len(voice):
+        background = np.pad(background, (0, len(voice) - len(background)))
+    mixed = np.clip(voice + background[:len(voice)], -32768, 32767).astype(np.int16)
+    
+    return AudioSegment(
+        mixed.tobytes(),
+        frame_rate=meditation.frame_rate,
+        sample_width=2,
+        channels=meditation.channels
+    )
+
+async def _mix_with_ffmpeg(meditation_path: str, ambient_path: str, output_path: str) -> bool:
+    """
+    Mix the meditation and ambient audio with a single ffmpeg filtergraph.
+    
+    The ambient input is looped indefinitely, lowered by 15dB and mixed
+    until the meditation track ends, which matches the pydub path.
+    
+    Args:
+        meditation_path: Path to the meditation audio file
+        ambient_path: Path to the ambient sound file
+        output_path: Path where the mixed MP3 should be saved
+        
+    Returns:
+        True if ffmpeg produced the output file, False otherwise
+    """
+    if FFMPEG_PATH is None:
+        return False
+    
+    # amix divides each input by the number of inputs, so restore the level afterwards
+    filtergraph = (
+        "[1:a]volume=-15dB[ambient];"
+        "[0:a][ambient]amix=inputs=2:duration=first:dropout_transition=0,volume=2"
+    )
+    
+    try:
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, *_FFMPEG_QUIET_ARGS, "-y",
+            "-i", meditation_path,
+            "-stream_loop", "-1", "-i", ambient_path,
+            "-filter_complex", filtergraph,
+            "-c:a", "libmp3lame", "-b:a", "128k",
+            output_path,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        try:
+            _, log = await process.communicate()
+        except asyncio.CancelledError:
+            # Don't leave ffmpeg running after the caller has given up on it
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+    except OSError as e:
+        print(f"ffmpeg mixing failed, falling back to pydub: {str(e)}")
+        return False
+    
+    if process.returncode != 0:
+        print(f"ffmpeg mixing failed (exit code {process.returncode}), falling back to pydub: {log.decode(errors='replace').strip()}")
+        return False
+    return True
@@ -4,16 +4,54 @@ This agent ensures audio files meet quality standards for meditation.
 """
 
 import os
+import asyncio
+import functools
+import json
 import logging
+import re
+import shutil
+import subprocess
 from pathlib import Path
 from pydub import AudioSegment
-from pydub.utils import mediainfo
 import tempfile
 
+# numpy lets the silence scans run as one vectorized pass over the samples
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# ffmpeg/ffprobe binaries for analyzing audio without decoding it in Python (falls back to pydub if missing)
+FFMPEG_PATH = shutil.which("ffmpeg")
+FFPROBE_PATH = shutil.which("ffprobe")
+
+# Report lines printed by ffmpeg's silencedetect and volumedetect filters
+_SILENCE_RE = re.compile(r'silence_(start|end): (-?\d+(?:\.\d+)?)')
+_MEAN_VOLUME_RE = re.compile(r'mean_volume: (-?\d+(?:\.\d+)?|-inf) dB')
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=512)
+def _probe_cached(audio_path, mtime, size):
+    """
+    Run ffprobe once per file version (path, mtime and size) and parse its JSON output.
+    
+    Args:
+        audio_path: Path to the audio file
+        mtime: Modification time of the file (part of the cache key)
+        size: Size of the file (part of the cache key)
+        
+    Returns:
+        Dictionary with the file's streams and format
+    """
+    output = subprocess.check_output(
+        [FFPROBE_PATH, "-v", "error", "-show_streams", "-show_format", "-of", "json", audio_path]
+    )
+    return json.loads(output)
+
 class AudioQualityCheckerAgent:
     """
     Agent for checking the quality of meditation audio files.
@@ -53,7 +91,9 @@ class AudioQualityCheckerAgent:
             audio_path: Path to the audio file to check
             
         Returns:
-            Tuple of (is_quality_acceptable, details_dict)
+            Tuple of (is_quality_acceptable, details_dict). A file rejected from its
+            ffprobe properties alone is not analyzed further, so its volume and
+            silence entries are None
         """
         logger.info(f"Checking quality of audio file: {audio_path}")
         
@@ -69,32 +109,75 @@ class AudioQualityCheckerAgent:
             return False, {"error": "File too small", "size_bytes": file_size}
         
         try:
-            # Load the audio file
-            audio = AudioSegment.from_file(audio_path)
-            
-            # Get basic audio properties
-            duration_ms = len(audio)
-            channels = audio.channels
-            sample_width = audio.sample_width * 8  # Convert to bits
-            frame_rate = audio.frame_rate
+            # Thresholds for long silent intros/outros
+            silence_threshold = -40  # dB
+            chunk_size = 1000  # 1 second chunks
             
-            # Get more detailed info using mediainfo
-            media_info = mediainfo(audio_path)
-            bitrate_raw = media_info.get('bit_rate', '0')
+            squares = None
+            silences = None
+            analyzed = True
+            if FFMPEG_PATH and FFPROBE_PATH:
+                # ffprobe reads the stream properties (cached per file version)
+                probe = await asyncio.to_thread(self._probe, audio_path)
+            else:
+                probe = {}
+            stream = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'audio'), {})
             
-            # Parse bitrate (may be in format like '192000' or '192k')
+            # ffprobe reports the bitrate as an integer string in bits per second
             try:
-                if 'k' in bitrate_raw.lower():
-                    bitrate_kbps = int(float(bitrate_raw.lower().replace('k', '')))
+                bitrate_kbps = int(probe.get('format', {}).get('bit_rate') or stream.get('bit_rate')) // 1000
+            except (TypeError, ValueError):
+                bitrate_kbps = 0
+            
+            if probe:
+                duration_raw = probe.get('format', {}).get('duration') or stream.get('duration')
+                try:
+                    duration_ms = int(float(duration_raw) * 1000)
+                except (TypeError, ValueError):
+                    duration_ms = 0
+                
+                channels = int(stream.get('channels', 0))
+                bits = str(stream.get('bits_per_raw_sample') or stream.get('bits_per_sample') or '')
+                sample_width = int(bits) if bits.isdigit() and int(bits) > 0 else 16  # Lossy codecs decode to 16-bit
+                frame_rate = int(stream.get('sample_rate', 0))
+                
+                # Files that are too short or too low quality are rejected from the probe
+                # alone, without decoding them for the silence analysis
+                if 0 < duration_ms < self.fallback_min_duration_ms or 0 < bitrate_kbps < self.min_bitrate_kbps:
+                    analyzed = False
                 else:
-                    bitrate_kbps = int(int(bitrate_raw) / 1000)
-            except (ValueError, AttributeError):
-                # If we can't parse the bitrate, estimate it from file size
-                duration_seconds = duration_ms / 1000
-                if duration_seconds > 0:
-                    bitrate_kbps = int((file_size * 8) / (duration_seconds * 1000))
+                    # Measure loudness and silent stretches in one ffmpeg filter pass
+                    volume_dbfs, silences = await self._detect_silence(audio_path, silence_threshold)
+            else:
+                # Load the audio file
+                audio = AudioSegment.from_file(audio_path)
+                
+                # Get basic audio properties
+                duration_ms = len(audio)
+                channels = audio.channels
+                sample_width = audio.sample_width * 8  # Convert to bits
+                frame_rate = audio.frame_rate
+                
+                if NUMPY_AVAILABLE:
+                    # Interleaved samples scaled to full scale, as pydub's dBFS measures them.
+                    # View pydub's buffer without copying and scale straight into one
+                    # preallocated float32 array (rather than an intermediate float64 copy)
+                    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[audio.sample_width]
+                    raw = np.frombuffer(audio.raw_data, dtype=dtype)
+                    squares = np.empty(len(raw), dtype=np.float32)
+                    np.multiply(raw, 1 / audio.max_possible_amplitude, out=squares, casting='unsafe')
+                    samples_per_ms = audio.frame_rate * audio.channels / 1000
+                    
+                    # Square once in place; the overall and per-chunk loudness both reuse it
+                    np.square(squares, out=squares)
+                    with np.errstate(divide='ignore'):
+                        volume_dbfs = float(10 * np.log10(squares.mean(dtype=np.float64))) if len(squares) else float('-inf')
                 else:
-                    bitrate_kbps = 0
+                    volume_dbfs = audio.dBFS
+            
+            # If there's no bitrate, estimate it from file size (bits per millisecond is kbps)
+            if bitrate_kbps == 0 and duration_ms > 0:
+                bitrate_kbps = file_size * 8 // duration_ms
             
             # Create the details dictionary
             details = {
@@ -127,36 +210,65 @@ class AudioQualityCheckerAgent:
             if frame_rate < self.min_sample_rate_hz:
                 issues.append(f"Sample rate too low: {frame_rate} Hz (min: {self.min_sample_rate_hz} Hz)")
             
-            # Check for valid audio content (not just silence)
-            if audio.dBFS < -45:
-                issues.append(f"Audio may be too quiet: {audio.dBFS:.2f} dBFS")
-            details["volume_dbfs"] = round(audio.dBFS, 2)
+            if not analyzed:
+                # Loudness and silences were never measured, so report them as unknown
+                details.update(volume_dbfs=None, intro_silence_seconds=None, outro_silence_seconds=None,
+                               issues=issues, is_acceptable=False)
+                logger.info(f"Audio quality check results: acceptable=False, issues={len(issues)} (rejected before analysis)")
+                return False, details
             
-            # Check for long silent intros/outros
-            silence_threshold = -40  # dB
-            chunk_size = 1000  # 1 second chunks
+            # Check for valid audio content (not just silence)
+            if volume_dbfs < -45:
+                issues.append(f"Audio may be too quiet: {volume_dbfs:.2f} dBFS")
+            details["volume_dbfs"] = round(volume_dbfs, 2)
             
-            # Check intro silence
-            intro_silence_ms = 0
-            for i in range(0, min(30000, duration_ms), chunk_size):  # Check first 30 seconds max
-                chunk = audio[i:i+chunk_size]
-                if chunk.dBFS < silence_threshold:
-                    intro_silence_ms += chunk_size
-                else:
-                    break
+            # Check intro silence (first 30 seconds max)
+            intro_end_ms = min(30000, duration_ms)
+            if silences is not None:
+                # A silence starting at the very beginning is the intro
+                intro_silence_ms = 0
+                if silences and silences[0][0] <= 0.05:
+                    intro_end = silences[0][1] if silences[0][1] is not None else duration_ms / 1000
+                    intro_silence_ms = int(intro_end * 1000)
+                intro_silence_ms = min(intro_silence_ms, intro_end_ms)
+            elif squares is not None:
+                silent = self._chunk_dbfs(squares, samples_per_ms, 0, intro_end_ms, chunk_size) < silence_threshold
+                intro_chunks = int(np.argmin(silent)) if not silent.all() else len(silent)
+                intro_silence_ms = intro_chunks * chunk_size
+            else:
+                intro_silence_ms = 0
+                for i in range(0, intro_end_ms, chunk_size):
+                    chunk = audio[i:i+chunk_size]
+                    if chunk.dBFS < silence_threshold:
+                        intro_silence_ms += chunk_size
+                    else:
+                        break
             
             if intro_silence_ms > self.max_silence_intro_ms:
                 issues.append(f"Long silent intro: {intro_silence_ms/1000:.1f} seconds")
             details["intro_silence_seconds"] = round(intro_silence_ms/1000, 1)
             
-            # Check outro silence
-            outro_silence_ms = 0
-            for i in range(max(0, duration_ms - 10000), duration_ms, chunk_size):  # Check last 10 seconds
-                chunk = audio[i:min(i+chunk_size, duration_ms)]
-                if chunk.dBFS < silence_threshold:
-                    outro_silence_ms += chunk_size
-                else:
-                    outro_silence_ms = 0  # Reset if we encounter non-silence
+            # Check outro silence (last 10 seconds), counting the trailing silent run
+            outro_start_ms = max(0, duration_ms - 10000)
+            if silences is not None:
+                # A silence that runs to the very end is the outro
+                outro_silence_ms = 0
+                if silences and (silences[-1][1] is None or silences[-1][1] * 1000 >= duration_ms - 50):
+                    outro_silence_ms = max(0, duration_ms - int(silences[-1][0] * 1000))
+                outro_silence_ms = min(outro_silence_ms, duration_ms - outro_start_ms)
+            elif squares is not None:
+                silent = self._chunk_dbfs(squares, samples_per_ms, outro_start_ms, duration_ms, chunk_size) < silence_threshold
+                outro_chunks = int(np.argmin(silent[::-1])) if not silent.all() else len(silent)
+                outro_silence_ms = outro_chunks * chunk_size
+            else:
+                # Walk back from the end and stop at the first non-silent chunk
+                outro_silence_ms = 0
+                for i in reversed(range(outro_start_ms, duration_ms, chunk_size)):
+                    chunk = audio[i:min(i+chunk_size, duration_ms)]
+                    if chunk.dBFS < silence_threshold:
+                        outro_silence_ms += chunk_size
+                    else:
+                        break
             
             if outro_silence_ms > self.max_silence_outro_ms:
                 issues.append(f"Long silent outro: {outro_silence_ms/1000:.1f} seconds")
@@ -183,6 +295,94 @@ class AudioQualityCheckerAgent:
             logger.error(f"Error checking audio quality: {str(e)}")
             return False, {"error": f"Failed to analyze audio: {str(e)}"}
     
+    async def _detect_silence(self, audio_path, threshold_db):
+        """
+        Find silent stretches and the overall loudness with a single ffmpeg filter pass.
+        
+        Runs the silencedetect and volumedetect filters (nothing is decoded into
+        Python) and parses their reports from ffmpeg's log output.
+        
+        Args:
+            audio_path: Path to the audio file
+            threshold_db: Level below which audio counts as silence (in dB)
+            
+        Returns:
+            Tuple of (mean volume in dBFS, list of [start, end] silences in seconds,
+            where end is None for a silence that lasts until the end of the file)
+        """
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, "-nostdin", "-hide_banner", "-nostats", "-i", audio_path,
+            "-af", f"silencedetect=noise={threshold_db}dB:d=1,volumedetect",
+            "-f", "null", "-",
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        try:
+            _, log = await process.communicate()
+        except asyncio.CancelledError:
+            # Stop ffmpeg too when the analysis is cancelled
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode} while analyzing {audio_path}")
+        log = log.decode(errors='replace')
+        
+        silences = []
+        for kind, value in _SILENCE_RE.findall(log):
+            if kind == 'start':
+                silences.append([float(value), None])
+            elif silences:
+                silences[-1][1] = float(value)
+        
+        mean_volume = _MEAN_VOLUME_RE.search(log)
+        volume_dbfs = float(mean_volume.group(1)) if mean_volume else float('-inf')
+        return volume_dbfs, silences
+    
+    def _probe(self, audio_path):
+        """
+        Read stream and container properties of an audio file with ffprobe.
+        
+        Args:
+            audio_path: Path to the audio file
+            
+        Returns:
+            Dictionary parsed from ffprobe's JSON output (streams and format)
+        """
+        stat = os.stat(audio_path)
+        return _probe_cached(audio_path, stat.st_mtime, stat.st_size)
+    
+    def _chunk_dbfs(self, squares, samples_per_ms, start_ms, end_ms, chunk_ms):
+        """
+        Compute the loudness of consecutive chunks of audio in one vectorized pass.
+        
+        A short last chunk is kept, like pydub's slicing does.
+        
+        Args:
+            squares: numpy array of squared samples (samples scaled to [-1, 1])
+            samples_per_ms: Number of samples per millisecond (across all channels)
+            start_ms: Start of the analyzed range in milliseconds
+            end_ms: End of the analyzed range in milliseconds
+            chunk_ms: Chunk length in milliseconds
+            
+        Returns:
+            numpy array with the dBFS of each chunk (-inf for digital silence)
+        """
+        start = int(start_ms * samples_per_ms)
+        end = int(end_ms * samples_per_ms)
+        step = max(1, int(chunk_ms * samples_per_ms))
+        
+        window = squares[start:end]
+        if len(window) == 0:
+            return np.empty(0)
+        
+        # Mean square per chunk, then RMS in dB relative to full scale
+        starts = np.arange(0, len(window), step)
+        sums = np.add.reduceat(window, starts, dtype=np.float64)
+        counts = np.diff(np.append(starts, len(window)))
+        with np.errstate(divide='ignore'):
+            return 10 * np.log10(sums / counts)
+    
     async def trim_audio_if_needed(self, audio_path, target_duration_ms=None):
         """
         Trim audio file to target duration if it's too long.
@@ -198,11 +398,13 @@ class AudioQualityCheckerAgent:
             target_duration_ms = self.target_duration_ms
             
         try:
-            # Load the audio file
-            audio = AudioSegment.from_file(audio_path)
-            
-            # Get duration
-            duration_ms = len(audio)
+            # Get duration (from the cached ffprobe result when available)
+            if FFMPEG_PATH and FFPROBE_PATH:
+                probe = await asyncio.to_thread(self._probe, audio_path)
+                duration_ms = int(float(probe.get('format', {}).get('duration') or 0) * 1000)
+            else:
+                audio = await asyncio.to_thread(AudioSegment.from_file, audio_path)
+                duration_ms = len(audio)
             
             # If duration is within acceptable range, don't trim
             if duration_ms <= self.max_duration_ms:
@@ -210,15 +412,36 @@ class AudioQualityCheckerAgent:
                 
             logger.info(f"Trimming audio file from {duration_ms/1000:.1f}s to {target_duration_ms/1000:.1f}s")
             
-            # Trim to target duration
-            trimmed_audio = audio[:target_duration_ms]
-            
             # Create output filename
             base_path = os.path.splitext(audio_path)[0]
             output_path = f"{base_path}_trimmed.mp3"
             
-            # Export trimmed audio
-            trimmed_audio.export(output_path, format="mp3", bitrate="192k")
+            if FFMPEG_PATH and FFPROBE_PATH:
+                # An MP3 source only needs its frames cut, not a decode and re-encode
+                if audio_path.lower().endswith('.mp3'):
+                    codec_args = ["-c", "copy"]
+                else:
+                    codec_args = ["-c:a", "libmp3lame", "-b:a", "192k"]
+                process = await asyncio.create_subprocess_exec(
+                    FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                    "-ss", "0", "-t", str(target_duration_ms / 1000), "-i", audio_path,
+                    *codec_args, output_path,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+                )
+                try:
+                    _, log = await process.communicate()
+                except asyncio.CancelledError:
+                    # A cancelled trim must not keep writing to output_path
+                    if process.returncode is None:
+                        process.kill()
+                    await process.wait()
+                    raise
+                if process.returncode != 0:
+                    raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {log.decode(errors='replace').strip()}")
+            else:
+                # Trim to target duration and export without blocking the event loop
+                trimmed_audio = audio[:target_duration_ms]
+                await asyncio.to_thread(trimmed_audio.export, output_path, format="mp3", bitrate="192k")
             
             logger.info(f"Audio trimmed and saved to: {output_path}")
             return output_path
@@ -5,21 +5,186 @@ This agent scrapes YouTube to find meditation audio URLs based on mood.
 
 import os
 import random
-import requests
 import asyncio
 import logging
 from pathlib import Path
-from urllib.parse import urlparse, urljoin, quote
-from bs4 import BeautifulSoup
+from types import MappingProxyType
+from urllib.parse import urlparse, urljoin, quote_plus
 import re
 import time
 import json
-import aiohttp
+import html as html_lib
+import tempfile
+import weakref
+import httpx
+
+# HTTP/2 lets concurrent YouTube requests share one multiplexed connection (requires h2)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Use orjson for faster cache parsing and writing when it's installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# HTTP clients shared by all AudioRetrieverAgent instances so pooled connections
+# outlive a single agent (one per event loop, dropped with the loop), and a TLS
+# context loaded once (certificate parsing is slow)
+_CLIENTS = weakref.WeakKeyDictionary()
+_SSL_CONTEXT = httpx.create_ssl_context(http2=HTTP2_AVAILABLE)
+
+# Default cache location, and cache directories already known to exist on disk
+# (shared across agent instances)
+_DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "assets" / "cached_audio"
+_ENSURED_DIRS = set()
+
+# Patterns used when scraping YouTube pages, compiled once (page patterns match
+# the raw response bytes, so only the matched snippets are ever decoded)
+_VIDEO_ID_RE = re.compile(rb'"videoId":"([^"]+)"')
+_VIDEO_URL_ID_RE = re.compile(r'v=([^&]+)')
+_META_DURATION_RE = re.compile(rb'<meta itemprop="duration" content="PT([0-9]+)M([0-9]+)S">')
+_LENGTH_SECONDS_RE = re.compile(rb'"lengthSeconds":"(\d+)"')
+_META_TITLE_RE = re.compile(rb'<meta name="title" content="([^"]*)">')
+_MINUTES_RE = re.compile(r'(\d+)\s*min')
+
+def _json_loads(data):
+    """Parse JSON from bytes or str, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj):
+    """Serialize an object to JSON bytes, using orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+# Map moods to search queries for YouTube
+_MOOD_TO_QUERY = MappingProxyType({
+    "calm": ("calm meditation music 10 minutes", "calming meditation guided", "peaceful meditation"),
+    "focused": ("focus meditation 10 minutes", "concentration meditation", "focus meditation guided"),
+    "relaxed": ("relaxing meditation 10 minutes", "relaxation guided meditation", "sleep meditation"),
+    "energized": ("energizing meditation music", "morning meditation", "energy boost meditation"),
+    "grateful": ("gratitude meditation 10 minutes", "gratitude practice guided", "appreciation meditation"),
+    "happy": ("happiness meditation 10 minutes", "joyful meditation guided", "positive energy meditation"),
+    "peaceful": ("peaceful meditation 10 minutes", "peace meditation guided", "tranquil meditation"),
+    "confident": ("confidence meditation 10 minutes", "self-esteem meditation", "empowerment meditation"),
+    "creative": ("creativity meditation 10 minutes", "creative flow meditation", "inspiration meditation"),
+    "compassionate": ("compassion meditation 10 minutes", "loving-kindness meditation", "heart meditation")
+})
+
+# French-specific queries for each mood
+_FRENCH_MOOD_TO_QUERY = MappingProxyType({
+    "calm": ("méditation calme 10 minutes", "musique méditation calme", "méditation pleine conscience"),
+    "focused": ("méditation concentration 10 minutes", "méditation focus", "méditation attention"),
+    "relaxed": ("méditation relaxante 10 minutes", "méditation pour dormir", "relaxation guidée"),
+    "energized": ("méditation énergie 10 minutes", "méditation revitalisante", "méditation matin"),
+    "grateful": ("méditation gratitude 10 minutes", "méditation reconnaissance", "pratique de gratitude"),
+    "happy": ("méditation bonheur 10 minutes", "méditation joie", "méditation bien-être"),
+    "peaceful": ("méditation paix 10 minutes", "méditation tranquillité", "méditation sérénité"),
+    "confident": ("méditation confiance 10 minutes", "méditation confiance en soi", "méditation estime de soi"),
+    "creative": ("méditation créativité 10 minutes", "méditation inspiration", "méditation imagination"),
+    "compassionate": ("méditation compassion 10 minutes", "méditation bienveillance", "méditation amour")
+})
+
+# Direct links to UCLA Mindful meditation files (French)
+_UCLA_FRENCH_MEDITATIONS = (
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-bodyscan.mp3",
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-breathsoundbody.mp3",
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-breathing.mp3",
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-complete.mp3",
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-lovingKindness.mp3",
+    "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-workingwithdifficulties.mp3"
+)
+
+# Rotating user agents to avoid being blocked
+_USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPad; CPU OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59'
+)
+
+# Browser-like headers sent with every request on the shared client
+_BROWSER_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Play buttons on the UCLA Mindful page that link to French meditation MP3s,
+# matched on the raw page bytes
+_UCLA_PLAY_LINK_RE = re.compile(rb'<a\s[^>]*?href\s*=\s*["\']([^"\']*guided-meditations/French-[^"\']*\.mp3)["\']', re.IGNORECASE)
+
+# Mood-related words used to guess the mood of a free-form query
+_MOOD_KEYWORDS = {
+    "calm": ["calm", "peace", "tranquil"],
+    "focused": ["focus", "concentrate", "attention"],
+    "relaxed": ["relax", "chill", "unwind"],
+    "energized": ["energy", "invigorate", "uplift"],
+    "grateful": ["gratitude", "thankful", "appreciate"],
+    "happy": ["happy", "joy", "cheerful"],
+    "peaceful": ["peace", "serene", "quiet"],
+    "confident": ["confidence", "esteem", "empowerment"],
+    "creative": ["creative", "imagination", "inspiration"],
+    "compassionate": ["compassion", "kindness", "loving"]
+}
+
+# The same words flattened into (keyword, mood) pairs, in order so the first mood listed wins
+_KEYWORD_MOODS = tuple((keyword, mood) for mood, keywords in _MOOD_KEYWORDS.items() for keyword in keywords)
+
+async def _get_client():
+    """
+    Get the HTTP client for the running event loop, creating it on first use.
+    
+    Each loop gets its own client, so a loop never closes a client another one
+    is still using. Clients of closed loops (e.g. an earlier asyncio.run) are
+    dropped and left to the garbage collector.
+    
+    Returns:
+        httpx.AsyncClient with a keep-alive connection pool (HTTP/2 when available)
+    """
+    loop = asyncio.get_running_loop()
+    for closed_loop in [other for other in _CLIENTS if other.is_closed()]:
+        del _CLIENTS[closed_loop]
+    
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=_BROWSER_HEADERS,
+            follow_redirects=True,
+            verify=_SSL_CONTEXT,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20, keepalive_expiry=300),
+            timeout=httpx.Timeout(15.0, connect=5.0)
+        )
+        _CLIENTS[loop] = client
+    return client
+
+async def close_client():
+    """
+    Close the running event loop's HTTP client.
+    
+    Every AudioRetrieverAgent on the loop shares this client, so it is closed
+    once at process shutdown rather than by any single agent.
+    """
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 class AudioRetrieverAgent:
     """
     Agent for retrieving meditation audio files from YouTube based on mood.
@@ -34,57 +199,80 @@ class AudioRetrieverAgent:
             cache_dir: Directory to cache downloaded audio files
         """
         if cache_dir is None:
-            self.cache_dir = Path(__file__).parent.parent / "assets" / "cached_audio"
+            self.cache_dir = _DEFAULT_CACHE_DIR
         else:
             self.cache_dir = Path(cache_dir)
         
-        # Create cache directory if it doesn't exist
-        os.makedirs(self.cache_dir, exist_ok=True)
-        
-        # Map moods to search queries for YouTube
-        self.mood_to_query = {
-            "calm": ["calm meditation music 10 minutes", "calming meditation guided", "peaceful meditation"],
-            "focused": ["focus meditation 10 minutes", "concentration meditation", "focus meditation guided"],
-            "relaxed": ["relaxing meditation 10 minutes", "relaxation guided meditation", "sleep meditation"],
-            "energized": ["energizing meditation music", "morning meditation", "energy boost meditation"],
-            "grateful": ["gratitude meditation 10 minutes", "gratitude practice guided", "appreciation meditation"],
-            "happy": ["happiness meditation 10 minutes", "joyful meditation guided", "positive energy meditation"],
-            "peaceful": ["peaceful meditation 10 minutes", "peace meditation guided", "tranquil meditation"],
-            "confident": ["confidence meditation 10 minutes", "self-esteem meditation", "empowerment meditation"],
-            "creative": ["creativity meditation 10 minutes", "creative flow meditation", "inspiration meditation"],
-            "compassionate": ["compassion meditation 10 minutes", "loving-kindness meditation", "heart meditation"]
-        }
+        # Create cache directory if it doesn't exist (checked once per directory)
+        if self.cache_dir not in _ENSURED_DIRS:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _ENSURED_DIRS.add(self.cache_dir)
+        
+        # Map moods to search queries for YouTube (shared, read-only)
+        self.mood_to_query = _MOOD_TO_QUERY
+        
+        # French-specific queries for each mood
+        self.french_mood_to_query = _FRENCH_MOOD_TO_QUERY
+        
+        # Words that reveal a query's mood, in priority order: mood names first, then
+        # the related keywords, so guessing a mood is a single pass
+        self._query_mood_words = tuple((mood, mood) for mood in self.mood_to_query) + _KEYWORD_MOODS
         
         # Define YouTube search URL template
         self.youtube_search_url = "https://www.youtube.com/results?search_query="
         
+        # Search URLs for all the predefined queries, built once
+        self._youtube_search_urls = {
+            query: self._build_search_url(query)
+            for queries in (*self.mood_to_query.values(), *self.french_mood_to_query.values())
+            for query in queries
+        }
+        
+        # Search concurrency: requests in flight per host (searches and video pages
+        # share it; over HTTP/2 they are multiplexed on one connection)
+        self.max_requests_per_host = 5
+        self._host_semaphores = {}
+        
+        # In-memory search results per query, reused for an hour (oldest evicted first)
+        self.search_results_ttl_seconds = 3600
+        self.search_results_cache_max_entries = 256
+        self._search_results_cache = {}
+        # Searches currently running per query, so concurrent callers share one request
+        self._searches_in_flight = {}
+        
+        # URLs reported unreachable (e.g. a 404 while downloading), skipped for an hour
+        self.dead_url_ttl_seconds = 3600
+        self._dead_urls = {}
+        
+        # Validators (ETag / Last-Modified) and bodies of fetched pages, so repeat
+        # fetches can be answered with 304 Not Modified instead of the whole page
+        self.page_cache_max_entries = 32
+        self._page_cache = {}
+        
         # Cache for YouTube video URLs to avoid repeatedly scraping the same pages
         self.youtube_cache_file = self.cache_dir / "youtube_cache.json"
         self.youtube_cache = self._load_youtube_cache()
+        # One save at a time, each taking its snapshot once it holds the lock,
+        # so an older snapshot can never replace a newer one on disk
+        self._youtube_cache_lock = asyncio.Lock()
         
         # UCLA Mindful URL for French meditations (keeping as a fallback)
         self.ucla_mindful_url = "https://www.uclahealth.org/uclamindful/guided-meditations"
         
         # Direct links to UCLA Mindful meditation files (French)
-        self.ucla_french_meditations = [
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-bodyscan.mp3",
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-breathsoundbody.mp3",
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-breathing.mp3",
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-complete.mp3",
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-lovingKindness.mp3",
-            "https://d1cy5zxxhbcbkk.cloudfront.net/guided-meditations/French-workingwithdifficulties.mp3"
-        ]
+        self.ucla_french_meditations = _UCLA_FRENCH_MEDITATIONS
         
         # Use rotating user agents to avoid being blocked
-        self.user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
-            'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
-            'Mozilla/5.0 (iPad; CPU OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59'
-        ]
+        self.user_agents = _USER_AGENTS
+        
+        # Per-request headers, one variant per user agent (built once and picked at random);
+        # the stable browser headers are set on the shared client instead
+        self._page_header_variants = tuple({'User-Agent': ua} for ua in self.user_agents)
+        
+        # YouTube searches also look like they come from a Google result
+        self._search_header_variants = tuple(
+            {**headers, 'Referer': 'https://www.google.com/', 'DNT': '1'} for headers in self._page_header_variants
+        )
     
     def _load_youtube_cache(self):
         """
@@ -95,22 +283,34 @@ class AudioRetrieverAgent:
         """
         if os.path.exists(self.youtube_cache_file):
             try:
-                with open(self.youtube_cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
+                with open(self.youtube_cache_file, 'rb') as f:
+                    return _json_loads(f.read())
+            except ValueError:
                 logger.warning("YouTube cache file is corrupted. Creating a new one.")
                 return {}
         return {}
     
-    def _save_youtube_cache(self):
+    def _save_youtube_cache(self, youtube_cache):
         """
-        Save the YouTube URL cache to the JSON file.
+        Atomically save the YouTube URL cache to the JSON file.
+        
+        Args:
+            youtube_cache: Snapshot of the mood_language -> entries mapping
         """
+        tmp_name = None
         try:
-            with open(self.youtube_cache_file, 'w') as f:
-                json.dump(self.youtube_cache, f)
+            with tempfile.NamedTemporaryFile('wb', dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                tmp_name = f.name
+                f.write(_json_dumps(youtube_cache))
+            os.replace(tmp_name, self.youtube_cache_file)
         except Exception as e:
             logger.error(f"Error saving YouTube cache: {str(e)}")
+            # Don't leave half-written temp files in the cache directory
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
     
     async def find_meditation(self, mood, language="english"):
         """
@@ -128,45 +328,19 @@ class AudioRetrieverAgent:
         mood = mood.lower().strip()
         language = language.lower().strip()
         
-        # For French language, search YouTube using French terms
-        if language == "french":
-            logger.info("Looking for French meditation videos on YouTube")
-            
-            # Create French-specific queries for this mood
-            french_queries = {
-                "calm": ["méditation calme 10 minutes", "musique méditation calme", "méditation pleine conscience"],
-                "focused": ["méditation concentration 10 minutes", "méditation focus", "méditation attention"],
-                "relaxed": ["méditation relaxante 10 minutes", "méditation pour dormir", "relaxation guidée"],
-                "energized": ["méditation énergie 10 minutes", "méditation revitalisante", "méditation matin"],
-                "grateful": ["méditation gratitude 10 minutes", "méditation reconnaissance", "pratique de gratitude"],
-                "happy": ["méditation bonheur 10 minutes", "méditation joie", "méditation bien-être"],
-                "peaceful": ["méditation paix 10 minutes", "méditation tranquillité", "méditation sérénité"],
-                "confident": ["méditation confiance 10 minutes", "méditation confiance en soi", "méditation estime de soi"],
-                "creative": ["méditation créativité 10 minutes", "méditation inspiration", "méditation imagination"],
-                "compassionate": ["méditation compassion 10 minutes", "méditation bienveillance", "méditation amour"]
-            }
-            
-            # Use French-specific queries if available, otherwise use generic French meditation query
-            if mood in french_queries:
-                queries = french_queries[mood]
-            else:
-                queries = ["méditation guidée 10 minutes", "méditation pleine conscience", "méditation relaxante"]
-        else:
-            # Get appropriate search queries for this mood for English
-            if mood in self.mood_to_query:
-                queries = self.mood_to_query[mood]
-            else:
-                # Default queries if mood isn't in our predefined list
-                queries = ["meditation music", "mindfulness meditation", "relaxing music"]
-        
         # Create a cache key
         cache_key = f"{mood}_{language}"
         
-        # Check if we have cached YouTube URLs for this mood and language
-        if cache_key in self.youtube_cache and self.youtube_cache[cache_key]:
+        # Check if we have cached YouTube URLs for this mood and language first,
+        # so the common case is a single lookup with no searching at all
+        cached_entries = self.youtube_cache.get(cache_key)
+        if cached_entries and self._dead_urls:
+            cached_entries = [entry for entry in cached_entries
+                              if not self._is_dead(entry['url'] if isinstance(entry, dict) else entry)]
+        if cached_entries:
             logger.info(f"Using cached YouTube URLs for mood: {mood}, language: {language}")
             # Get a random entry from the cache
-            selected_entry = random.choice(self.youtube_cache[cache_key])
+            selected_entry = random.choice(cached_entries)
             
             # Check if it's a URL or a dict with URL and metadata
             if isinstance(selected_entry, dict) and 'url' in selected_entry:
@@ -181,25 +355,32 @@ class AudioRetrieverAgent:
                 # Just a URL without metadata
                 return selected_entry
         
-        # Try YouTube search with our queries
-        all_youtube_urls = []
-        youtube_metadata = {}
-        
-        for query in queries:
-            logger.info(f"Searching YouTube with query: {query}")
-            youtube_urls = await self._search_youtube(query)
-            if youtube_urls:
-                all_youtube_urls.extend(youtube_urls)
-                logger.info(f"Found {len(youtube_urls)} YouTube videos for query: {query}")
-            await asyncio.sleep(0.5)
+        # For French language, search YouTube using French terms
+        if language == "french":
+            logger.info("Looking for French meditation videos on YouTube")
+            
+            # Use French-specific queries if available, otherwise use generic French meditation query
+            if mood in self.french_mood_to_query:
+                queries = self.french_mood_to_query[mood]
+            else:
+                queries = ["méditation guidée 10 minutes", "méditation pleine conscience", "méditation relaxante"]
+        else:
+            # Get appropriate search queries for this mood for English
+            if mood in self.mood_to_query:
+                queries = self.mood_to_query[mood]
+            else:
+                # Default queries if mood isn't in our predefined list
+                queries = ["meditation music", "mindfulness meditation", "relaxing music"]
         
-        # Filter URLs to match our criteria and get metadata
-        filtered_entries = await self._filter_youtube_urls(all_youtube_urls)
+        # Search YouTube with all our queries at once and check the candidates
+        # as they come in (requests per host are bounded in the helpers)
+        filtered_entries = await self._find_suitable_videos(queries)
         
         if filtered_entries:
             # Cache the results for future use
             self.youtube_cache[cache_key] = filtered_entries
-            self._save_youtube_cache()
+            async with self._youtube_cache_lock:
+                await asyncio.to_thread(self._save_youtube_cache, dict(self.youtube_cache))
             
             # Return a random entry with its metadata
             selected_entry = random.choice(filtered_entries)
@@ -220,17 +401,12 @@ class AudioRetrieverAgent:
         # If no YouTube videos found, fall back to UCLA meditation files only for French language
         if language == "french":
             logger.warning(f"No suitable YouTube meditations found for {mood} in French. Using UCLA fallback.")
-            fallback_url = random.choice(self.ucla_french_meditations)
+            fallback_url = self._pick_live(self.ucla_french_meditations)
             return (fallback_url, {'youtube_url': None, 'title': 'UCLA French Meditation'})
         
         # For other languages, try one more general search
         logger.warning(f"No suitable YouTube meditations found for {mood}. Trying generic search.")
-        if language == "french":
-            generic_query = "méditation guidée"
-        else:
-            generic_query = "guided meditation"
-            
-        youtube_urls = await self._search_youtube(generic_query)
+        youtube_urls = await self._search_youtube("guided meditation")
         if youtube_urls:
             url = youtube_urls[0]
             source_info = {
@@ -239,14 +415,50 @@ class AudioRetrieverAgent:
             }
             return (url, source_info)
             
-        # Absolute last resort - return a UCLA URL for French or a default URL for other languages
-        if language == "french":
-            fallback_url = random.choice(self.ucla_french_meditations)
-        else:
-            fallback_url = "https://mindfulness-exercises-free.s3.amazonaws.com/10-Minute-Mindfulness-Meditation.mp3"
-            
+        # Absolute last resort - return a default URL
+        fallback_url = "https://mindfulness-exercises-free.s3.amazonaws.com/10-Minute-Mindfulness-Meditation.mp3"
         return (fallback_url, {'youtube_url': None, 'title': 'Fallback Meditation'})
     
+    def mark_unavailable(self, url):
+        """
+        Record that a URL couldn't be retrieved so it isn't picked again for a while.
+        
+        Args:
+            url: The unreachable meditation URL
+        """
+        self._dead_urls[url] = time.monotonic() + self.dead_url_ttl_seconds
+    
+    def _is_dead(self, url):
+        """
+        Check whether a URL was recently reported unreachable.
+        
+        Args:
+            url: URL to check
+            
+        Returns:
+            True if the URL should be skipped, False otherwise
+        """
+        expires_at = self._dead_urls.get(url)
+        if expires_at is None:
+            return False
+        if time.monotonic() >= expires_at:
+            del self._dead_urls[url]
+            return False
+        return True
+    
+    def _pick_live(self, urls):
+        """
+        Pick a random URL, preferring ones not recently reported unreachable.
+        
+        Args:
+            urls: Candidate URLs
+            
+        Returns:
+            A randomly selected URL
+        """
+        live_urls = [url for url in urls if not self._is_dead(url)] if self._dead_urls else urls
+        return random.choice(live_urls or urls)
+    
     async def _search_youtube(self, query):
         """
         Search YouTube for meditation videos matching the query.
@@ -257,89 +469,199 @@ class AudioRetrieverAgent:
         Returns:
             List of YouTube video URLs
         """
+        # Reuse recent results for the same query instead of scraping again
+        cached = self._search_results_cache.get(query)
+        if cached is not None:
+            expires_at, cached_urls = cached
+            if time.monotonic() < expires_at:
+                return list(cached_urls)
+            del self._search_results_cache[query]
+        
+        # Join a search already running for this query rather than starting another;
+        # shielded so one caller giving up does not cancel it for the others
+        search = self._searches_in_flight.get(query)
+        if search is None:
+            search = asyncio.create_task(self._scrape_youtube_search(query))
+            self._searches_in_flight[query] = search
+            search.add_done_callback(lambda _: self._searches_in_flight.pop(query, None))
+        return list(await asyncio.shield(search))
+    
+    async def _scrape_youtube_search(self, query):
+        """
+        Fetch a YouTube search results page and extract video URLs.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            List of YouTube video URLs (empty on failure)
+        """
         try:
-            # Format query for URL
-            formatted_query = quote(f"{query} meditation")
-            search_url = f"{self.youtube_search_url}{formatted_query}"
+            # Predefined queries have their URL prepared already
+            search_url = self._youtube_search_urls.get(query) or self._build_search_url(query)
             
             # Choose a random user agent
-            headers = {
-                'User-Agent': random.choice(self.user_agents),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.google.com/',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
+            headers = random.choice(self._search_header_variants)
             
-            # Make the request
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url, headers=headers, timeout=15) as response:
-                    if response.status != 200:
-                        logger.warning(f"YouTube search returned status {response.status}")
-                        return []
-                    
-                    html = await response.text()
+            # Make the request, bounding how many run against YouTube at once
+            async with self._host_semaphore("www.youtube.com"):
+                status, content = await self._fetch_page(search_url, headers, timeout=15)
+            if status != 200:
+                logger.warning(f"YouTube search returned status {status}")
+                return []
             
             # Parse video IDs from the response
             # YouTube search results contain a pattern like "videoId":"VIDEO_ID"
-            video_ids = re.findall(r'"videoId":"([^"]+)"', html)
+            # Remove duplicates (keeping page order) and stop scanning at 10 results,
+            # leaving the rest of the page (mostly scripts) unsearched
+            video_ids = {}
+            for match in _VIDEO_ID_RE.finditer(content):
+                video_ids[match.group(1)] = None
+                if len(video_ids) >= 10:
+                    break
             
             # Create URLs from video IDs and return
-            youtube_urls = [f"https://www.youtube.com/watch?v={vid}" for vid in video_ids]
+            youtube_urls = [f"https://www.youtube.com/watch?v={vid.decode('ascii', errors='replace')}" for vid in video_ids]
             
-            # Remove duplicates
-            youtube_urls = list(set(youtube_urls))
+            # Remember the candidates (the caller still picks randomly among them)
+            if youtube_urls:
+                if len(self._search_results_cache) >= self.search_results_cache_max_entries:
+                    self._search_results_cache.pop(next(iter(self._search_results_cache)))
+                self._search_results_cache[query] = (time.monotonic() + self.search_results_ttl_seconds, youtube_urls)
             
-            return youtube_urls[:10]  # Limit to first 10 results
+            return youtube_urls
             
         except Exception as e:
             logger.error(f"Error searching YouTube: {str(e)}")
             return []
     
-    async def _filter_youtube_urls(self, urls):
+    def _build_search_url(self, query):
         """
-        Filter YouTube URLs to find those that match our criteria.
+        Build the YouTube search URL for a query.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            YouTube search results URL
+        """
+        return f"{self.youtube_search_url}{quote_plus(f'{query} meditation')}"
+    
+    async def _fetch_page(self, url, headers, timeout):
+        """
+        Fetch a page, revalidating a previously fetched copy with a conditional request.
+        
+        Args:
+            url: URL of the page
+            headers: Request headers
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Tuple of (HTTP status, body bytes); a 304 response is returned as a 200
+            with the remembered body
+        """
+        cached = self._page_cache.get(url)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            headers = dict(headers)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        client = await _get_client()
+        response = await client.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            return 200, cached[2]
+        if response.status_code != 200:
+            return response.status_code, b''
+        content = response.content
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        
+        # Remember the page only if the server gave us something to revalidate with
+        if etag or last_modified:
+            self._page_cache.pop(url, None)
+            if len(self._page_cache) >= self.page_cache_max_entries:
+                self._page_cache.pop(next(iter(self._page_cache)))
+            self._page_cache[url] = (etag, last_modified, content)
+        return 200, content
+    
+    def _host_semaphore(self, host):
+        """
+        Get the semaphore limiting concurrent requests to a single host.
+        
+        Args:
+            host: Hostname being requested
+            
+        Returns:
+            asyncio.Semaphore for the host
+        """
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_requests_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def _find_suitable_videos(self, queries):
+        """
+        Search YouTube and find videos that match our criteria.
         - Duration between 8-15 minutes
         - Has proper meditation content
         
+        Each candidate's page is checked as soon as the search that found it
+        returns, rather than after every search has finished.
+        
         Args:
-            urls: List of YouTube URLs to filter
+            queries: Search queries to run
             
         Returns:
             List of filtered YouTube entries (dicts with url, title, and duration)
         """
         filtered_entries = []
-        
-        for url in urls:
-            try:
-                # Get video info to check duration
-                video_info = await self._get_youtube_video_info(url)
-                
-                if video_info is None:
-                    continue
-                
-                # Check if duration is suitable (8-15 minutes)
-                duration_seconds = video_info.get('duration_seconds', 0)
-                if 480 <= duration_seconds <= 900:
-                    # Store as dict with metadata
-                    entry = {
-                        'url': url,
-                        'title': video_info.get('title', ''),
-                        'duration_seconds': duration_seconds
-                    }
-                    filtered_entries.append(entry)
-                    # Once we have 5 suitable entries, stop checking
-                    if len(filtered_entries) >= 5:
-                        break
-                
-            except Exception as e:
-                logger.error(f"Error filtering YouTube URL {url}: {str(e)}")
-                continue
-            
-            # Add a small delay to avoid rate limiting
-            await asyncio.sleep(0.2)
+        seen_urls = set()
+        search_tasks = {asyncio.create_task(self._search_youtube(query)) for query in queries}
+        pending = set(search_tasks)
+        try:
+            # Keep every search running until 5 entries have passed the duration check
+            # (a query's raw results may all be unsuitable)
+            while pending and len(filtered_entries) < 5:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is not None:
+                        logger.error(f"Error filtering YouTube URL: {str(task.exception())}")
+                        continue
+                    
+                    if task in search_tasks:
+                        youtube_urls = task.result()
+                        if youtube_urls:
+                            logger.info(f"Found {len(youtube_urls)} YouTube videos for a query")
+                        for url in youtube_urls:
+                            # Check each new candidate once, skipping videos already known to be gone
+                            if url in seen_urls or (self._dead_urls and self._is_dead(url)):
+                                continue
+                            seen_urls.add(url)
+                            pending.add(asyncio.create_task(self._get_youtube_video_info(url)))
+                        continue
+                    
+                    video_info = task.result()
+                    if video_info is None:
+                        continue
+                    
+                    # Check if duration is suitable (8-15 minutes)
+                    duration_seconds = video_info.get('duration_seconds', 0)
+                    if 480 <= duration_seconds <= 900 and len(filtered_entries) < 5:
+                        # Store as dict with metadata
+                        filtered_entries.append({
+                            'url': video_info['url'],
+                            'title': video_info.get('title', ''),
+                            'duration_seconds': duration_seconds
+                        })
+        finally:
+            for task in pending:
+                task.cancel()
         
         return filtered_entries
     
@@ -355,35 +677,24 @@ class AudioRetrieverAgent:
         """
         try:
             # Extract video ID from URL
-            video_id = re.search(r'v=([^&]+)', url).group(1)
-            
-            # Use YouTube's oEmbed API to get basic info
-            oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-            
-            headers = {
-                'User-Agent': random.choice(self.user_agents),
-                'Accept': 'application/json'
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(oembed_url, headers=headers, timeout=10) as response:
-                    if response.status != 200:
-                        return None
-                    
-                    oembed_data = await response.json()
+            video_id = _VIDEO_URL_ID_RE.search(url).group(1)
             
-            # Now get the video page to extract duration
+            # The video page has both the duration and the title, so one request is enough
             video_url = f"https://www.youtube.com/watch?v={video_id}"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_url, headers={'User-Agent': random.choice(self.user_agents)}, timeout=15) as response:
-                    if response.status != 200:
-                        return None
-                    
-                    html = await response.text()
+            async with self._host_semaphore("www.youtube.com"):
+                client = await _get_client()
+                response = await client.get(video_url, headers=random.choice(self._page_header_variants), timeout=15)
+            if response.status_code != 200:
+                # A removed video won't come back, so stop offering it
+                if response.status_code in (404, 410):
+                    self.mark_unavailable(url)
+                return None
+            
+            html = response.content
             
             # Extract length from the HTML - YouTube embeds duration in a meta tag
-            duration_match = re.search(r'<meta itemprop="duration" content="PT([0-9]+)M([0-9]+)S">', html)
+            duration_match = _META_DURATION_RE.search(html)
             
             if duration_match:
                 minutes = int(duration_match.group(1))
@@ -391,14 +702,15 @@ class AudioRetrieverAgent:
                 duration_seconds = minutes * 60 + seconds
             else:
                 # Alternative method to find duration
-                length_match = re.search(r'"lengthSeconds":"(\d+)"', html)
+                length_match = _LENGTH_SECONDS_RE.search(html)
                 if length_match:
                     duration_seconds = int(length_match.group(1))
                 else:
                     duration_seconds = 0
             
             # Get title and other info
-            title = oembed_data.get('title', '')
+            title_match = _META_TITLE_RE.search(html)
+            title = html_lib.unescape(title_match.group(1).decode('utf-8', errors='replace')) if title_match else ''
             
             return {
                 'id': video_id,
@@ -442,7 +754,7 @@ class AudioRetrieverAgent:
             pass
             
         # For unusual formats, check if "10 min" or similar is in the text
-        match = re.search(r'(\d+)\s*min', duration_text.lower())
+        match = _MINUTES_RE.search(duration_text.lower())
         if match:
             minutes = int(match.group(1))
             return 8 <= minutes <= 15
@@ -459,31 +771,9 @@ class AudioRetrieverAgent:
         Returns:
             Extracted mood or "default"
         """
+        # Return the mood of the first matching word (mood names come first)
         query_lower = query.lower()
-        for mood in self.mood_to_query:
-            if mood in query_lower:
-                return mood
-                
-        # Check if any mood-related words are in the query
-        mood_keywords = {
-            "calm": ["calm", "peace", "tranquil"],
-            "focused": ["focus", "concentrate", "attention"],
-            "relaxed": ["relax", "chill", "unwind"],
-            "energized": ["energy", "invigorate", "uplift"],
-            "grateful": ["gratitude", "thankful", "appreciate"],
-            "happy": ["happy", "joy", "cheerful"],
-            "peaceful": ["peace", "serene", "quiet"],
-            "confident": ["confidence", "esteem", "empowerment"],
-            "creative": ["creative", "imagination", "inspiration"],
-            "compassionate": ["compassion", "kindness", "loving"]
-        }
-        
-        for mood, keywords in mood_keywords.items():
-            for keyword in keywords:
-                if keyword in query_lower:
-                    return mood
-        
-        return "default"
+        return next((mood for word, mood in self._query_mood_words if word in query_lower), "default")
     
     async def scrape_ucla_meditations(self, language="french"):
         """
@@ -499,41 +789,30 @@ class AudioRetrieverAgent:
         
         try:
             # Choose a random user agent
-            headers = {
-                'User-Agent': random.choice(self.user_agents),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
+            headers = random.choice(self._page_header_variants)
             
             # UCLA Mindful URL with language anchor
             url = f"{self.ucla_mindful_url}#{language.lower()}"
             
-            # Make request
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Make request (the page rarely changes, so repeat fetches are usually a 304)
+            status, content = await self._fetch_page(url, headers, timeout=10)
+            if status != 200:
+                raise RuntimeError(f"UCLA Mindful page returned status {status}")
             
             # Look for the French section table
             meditation_urls = []
             
-            # Find all play buttons within the page
-            play_links = soup.find_all('a', attrs={'href': lambda href: href and 'guided-meditations/French-' in href})
-            
-            for link in play_links:
-                href = link.get('href')
-                if href and href.endswith('.mp3'):
-                    # Ensure URL is absolute
-                    absolute_url = href if href.startswith('http') else urljoin(self.ucla_mindful_url, href)
-                    meditation_urls.append(absolute_url)
+            # Find all play buttons within the page (no HTML tree is built)
+            for match in _UCLA_PLAY_LINK_RE.finditer(content):
+                href = html_lib.unescape(match.group(1).decode('utf-8', errors='replace'))
+                # Ensure URL is absolute
+                absolute_url = href if href.startswith('http') else urljoin(self.ucla_mindful_url, href)
+                meditation_urls.append(absolute_url)
             
             # If we couldn't find any links using the normal method, use our pre-defined list
             if not meditation_urls:
                 logger.warning("Could not find meditation links, using pre-defined list")
-                meditation_urls = self.ucla_french_meditations
+                meditation_urls = list(self.ucla_french_meditations)
             
             logger.info(f"Found {len(meditation_urls)} {language} meditation URLs")
             return meditation_urls
@@ -541,4 +820,4 @@ class AudioRetrieverAgent:
         except Exception as e:
             logger.error(f"Error scraping UCLA Mindful website: {str(e)}")
             # Fall back to our pre-defined list
-            return self.ucla_french_meditations 
\ No newline at end of file
+            return list(self.ucla_french_meditations)
\ No newline at end of file
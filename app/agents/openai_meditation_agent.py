@@ -6,8 +6,15 @@ This agent uses OpenAI to find meditation YouTube URLs based on mood.
 import os
 import logging
 import json
+import random
+import re
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from app.utils.config import OPENAI_API_KEY
@@ -16,6 +23,31 @@ from app.utils.config import OPENAI_API_KEY
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Patterns for pulling a YouTube URL out of OpenAI's reply, compiled once
+_JSON_URL_RE = re.compile(r'(?:url:|"url":)\s*[\'"]?(https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]+)[\'"]?')
+_YOUTUBE_URL_RE = re.compile(r'(https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]+)')
+
+# Shared HTTP session so the OpenAI and YouTube connections are kept alive between
+# calls, retrying failed connections with a short backoff
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+))
+_HTTP_SESSION.headers.update({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+})
+
+# Bounded pool for the blocking HTTP and pytube calls, so they run off the event loop
+# without competing with other work for the default executor's threads
+_HTTP_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='openai-http')
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking call in the HTTP thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_HTTP_POOL, functools.partial(func, *args, **kwargs))
+
 # Import pytube for YouTube validation
 try:
     from pytube import YouTube
@@ -45,6 +77,12 @@ class OpenAIMeditationAgent:
         # Maximum number of attempts to find valid video
         self.max_validation_attempts = 3
         
+        # Successful validations per URL, reused for an hour since OpenAI often suggests
+        # the same videos (oldest evicted first)
+        self.validation_ttl_seconds = 3600
+        self.validation_cache_max_entries = 256
+        self._validation_cache = {}
+        
         # Fallback videos known to be reliable
         self.fallback_videos = [
             "https://www.youtube.com/watch?v=ZToicYcHIOU",  # 10 min meditation
@@ -110,12 +148,11 @@ class OpenAIMeditationAgent:
                         logger.warning(f"YouTube video was already watched: {youtube_url} (attempt {attempts}/{max_attempts})")
                         # Add information to prompt to avoid returning the same URL
                         prompt += f" Do not return {youtube_url} as it was already watched."
-                        # Short delay before trying again
-                        await asyncio.sleep(0.5)
+                        # Ask again straight away: the amended prompt is a new request
                         continue
                     
                     # Validate the YouTube URL
-                    is_valid = await self._validate_youtube_url(youtube_url)
+                    is_valid = await self._validate_youtube_url_cached(youtube_url)
                     
                     if is_valid:
                         logger.info(f"YouTube video is valid and available: {youtube_url}")
@@ -129,9 +166,7 @@ class OpenAIMeditationAgent:
                         logger.warning(f"YouTube video is unavailable: {youtube_url} (attempt {attempts}/{max_attempts})")
                         # Add information to prompt to avoid returning the same invalid URL
                         prompt += f" Do not return {youtube_url} as it's unavailable."
-                        
-                        # Short delay before trying again
-                        await asyncio.sleep(0.5)
+                        # Ask again straight away: the amended prompt is a new request
                         continue
                 else:
                     logger.warning(f"OpenAI response did not contain a valid YouTube URL (attempt {attempts}/{max_attempts})")
@@ -143,12 +178,8 @@ class OpenAIMeditationAgent:
             await asyncio.sleep(1)
                 
         # If we've exhausted all attempts, return a fallback URL
-        fallback_url = self._get_fallback_url()
-        # Make sure the fallback is not in watched videos
-        for _ in range(5):  # Try up to 5 times to find an unwatched fallback
-            if fallback_url not in watched_videos:
-                break
-            fallback_url = self._get_fallback_url()
+        # (one that hasn't been watched yet, if there is one)
+        fallback_url = self._get_fallback_url(watched_videos)
             
         logger.warning(f"Exhausted all validation attempts, using fallback URL: {fallback_url}")
         
@@ -157,6 +188,34 @@ class OpenAIMeditationAgent:
             "title": "Fallback Meditation Video"
         }
     
+    async def _validate_youtube_url_cached(self, youtube_url: str) -> bool:
+        """
+        Validate a YouTube URL, reusing a recent successful check of the same URL.
+        
+        Args:
+            youtube_url: The YouTube URL to validate
+            
+        Returns:
+            Boolean indicating if the URL is valid and video is available
+        """
+        cached = self._validation_cache.get(youtube_url)
+        if cached is not None:
+            expires_at, is_valid = cached
+            if time.monotonic() < expires_at:
+                return is_valid
+            del self._validation_cache[youtube_url]
+        
+        is_valid = await self._validate_youtube_url(youtube_url)
+        
+        # Only remember videos that passed, so a transient network error doesn't
+        # keep a good video rejected for the whole TTL
+        if not is_valid:
+            return False
+        if len(self._validation_cache) >= self.validation_cache_max_entries:
+            self._validation_cache.pop(next(iter(self._validation_cache)))
+        self._validation_cache[youtube_url] = (time.monotonic() + self.validation_ttl_seconds, is_valid)
+        return is_valid
+    
     async def _validate_youtube_url(self, youtube_url: str) -> bool:
         """
         Validate if a YouTube URL points to an available video.
@@ -177,12 +236,9 @@ class OpenAIMeditationAgent:
         
         # Fallback: Basic URL check with requests
         try:
-            # Simple availability check using requests
+            # Simple availability check using requests (in a thread so the event loop isn't blocked)
             # Just check if the page exists, not if video is playable
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.head(youtube_url, headers=headers, timeout=5)
+            response = await _run_blocking(_HTTP_SESSION.head, youtube_url, timeout=5)
             
             # HEAD request worked
             if response.status_code == 200:
@@ -201,8 +257,8 @@ class OpenAIMeditationAgent:
                         
                         # This will raise an exception if the video is unavailable
                         try:
-                            # Attempt to access video metadata
-                            yt.check_availability()
+                            # Attempt to access video metadata (fetches the page, so off the loop)
+                            await _run_blocking(yt.check_availability)
                             return True
                         except (PytubeError, VideoUnavailable, RegexMatchError) as e:
                             logger.warning(f"YouTube validation failed: {str(e)}")
@@ -221,15 +277,18 @@ class OpenAIMeditationAgent:
             logger.error(f"Error checking YouTube URL: {str(e)}")
             return False
     
-    def _get_fallback_url(self) -> str:
+    def _get_fallback_url(self, watched_videos: Optional[List[str]] = None) -> str:
         """
         Get a fallback YouTube URL from the list of known good videos.
         
+        Args:
+            watched_videos: Previously watched video URLs to avoid when possible
+        
         Returns:
             A fallback YouTube URL
         """
-        import random
-        return random.choice(self.fallback_videos)
+        unwatched = [url for url in self.fallback_videos if url not in (watched_videos or ())]
+        return random.choice(unwatched or self.fallback_videos)
     
     async def _call_openai(self, prompt: str) -> str:
         """
@@ -266,11 +325,13 @@ class OpenAIMeditationAgent:
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            # Make the API call
-            response = requests.post(
+            # Make the API call over the shared session, without blocking the event loop
+            response = await _run_blocking(
+                _HTTP_SESSION.post,
                 self.api_url,
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=30
             )
             
             # Check for successful response
@@ -302,9 +363,8 @@ class OpenAIMeditationAgent:
         try:
             # Handle both formats: {"url": "..."} and {url: '...'}
             if "{url:" in response_text or "{\"url\":" in response_text:
-                import re
                 # Extract URL directly using regex to handle inconsistent quotes
-                url_match = re.search(r'(?:url:|"url":)\s*[\'"]?(https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]+)[\'"]?', response_text)
+                url_match = _JSON_URL_RE.search(response_text)
                 if url_match:
                     return url_match.group(1)
             
@@ -316,8 +376,7 @@ class OpenAIMeditationAgent:
             logger.warning(f"Failed to parse JSON from response: {response_text}")
             
         # Try to extract with regex if JSON parsing failed
-        import re
-        url_match = re.search(r'(https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]+)', response_text)
+        url_match = _YOUTUBE_URL_RE.search(response_text)
         
         if url_match:
             return url_match.group(1)
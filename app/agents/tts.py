@@ -1,5 +1,4 @@
 import os
-import re
 import tempfile
 from pathlib import Path
 import subprocess
@@ -30,7 +29,7 @@ class TTSSynthesisAgent:
         """
         # Replace [pause] markers with SSML pauses
         # For simplicity, we'll use a standard pause length of 2 seconds
-        processed = re.sub(r'\[pause\]', '<break time="2s"/>', script)
+        processed = script.replace('[pause]', '<break time="2s"/>')
         
         # Add SSML tags for a slower speaking rate
         processed = f'<speak><prosody rate="slow">{processed}</prosody></speak>'
@@ -0,0 +1,105 @@
+import asyncio
+import time
+import pytest
+from app.agents.apple_music_api import AppleMusicAgent
+
+def test_recently_used_tracks_window(tmp_path):
+    """Test that only the last 5 used tracks are remembered."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+
+    for track_id in ["1", "2", "3", "4", "5", "6"]:
+        agent._mark_track_used(track_id)
+
+    assert list(agent.recently_used_tracks) == ["2", "3", "4", "5", "6"]
+    assert agent._recent_ids == {"2", "3", "4", "5", "6"}
+
+    # A repeated ID stays in the lookup set while it is still in the window
+    agent._mark_track_used("2")
+    assert list(agent.recently_used_tracks) == ["3", "4", "5", "6", "2"]
+    assert "2" in agent._recent_ids
+    assert "3" in agent._recent_ids
+
+def test_search_cache_evicts_least_recently_used(tmp_path):
+    """Test that the search cache keeps only the most recently used keys."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    agent.search_cache_max_entries = 2
+
+    agent._cache_put("calm_english", [{"id": "1"}])
+    agent._cache_put("focused_english", [{"id": "2"}])
+    assert agent._cache_get("calm_english") == [{"id": "1"}]
+
+    agent._cache_put("happy_english", [{"id": "3"}])
+    assert list(agent.search_cache) == ["calm_english", "happy_english"]
+    assert agent._cache_get("focused_english") is None
+
+def test_save_search_cache_round_trip(tmp_path):
+    """Test that the search cache is written atomically and reloaded."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    agent._cache_put("calm_english", [{"id": "1"}])
+    agent._save_search_cache()
+
+    assert not agent.search_cache_file.with_suffix('.tmp').exists()
+    reloaded = AppleMusicAgent(cache_dir=tmp_path)
+    assert reloaded._cache_get("calm_english") == [{"id": "1"}]
+
+def test_pick_unused_skips_recent_tracks(tmp_path):
+    """Test that recently used tracks are never picked while others remain."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    tracks = [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+    agent._mark_track_used("1")
+    agent._mark_track_used("3")
+
+    for _ in range(20):
+        assert agent._pick_unused(tracks) == {"id": "2"}
+
+    agent._mark_track_used("2")
+    assert agent._pick_unused(tracks) is None
+
+def test_filter_meditation_tracks_by_duration(tmp_path):
+    """Test that only unused 8-15 minute tracks are kept."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    agent._mark_track_used("used")
+    search_results = {"results": {"songs": {"data": [
+        {"id": "short", "attributes": {"durationInMillis": 300000}},
+        {"id": "good", "attributes": {"durationInMillis": 600000}},
+        {"id": "used", "attributes": {"durationInMillis": 600000}},
+        {"id": "no_attributes"},
+    ]}}}
+
+    filtered = agent._filter_meditation_tracks(search_results)
+    assert [track["id"] for track in filtered] == ["good"]
+
+@pytest.mark.asyncio
+async def test_search_meditation_tracks_stops_when_enough_found(tmp_path):
+    """Test that searches are merged by track ID and slow searches are skipped once enough tracks are found."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    agent.enough_tracks = 2
+
+    def song(track_id):
+        return {"id": track_id, "attributes": {"durationInMillis": 600000}}
+
+    async def fake_search(query):
+        if query == "slow":
+            await asyncio.sleep(10)
+        return {"results": {"songs": {"data": [song(f"{query}-1"), song(f"{query}-2")]}}}
+
+    agent._search_apple_music = fake_search
+    tracks = await asyncio.wait_for(agent._search_meditation_tracks(("fast", "slow")), timeout=5)
+    assert [track["id"] for track in tracks] == ["fast-1", "fast-2"]
+
+@pytest.mark.asyncio
+async def test_search_cache_tail_is_flushed_by_timer(tmp_path):
+    """Test that updates below the flush threshold are written once the flush interval passes."""
+    agent = AppleMusicAgent(cache_dir=tmp_path)
+    agent._cache_flush_interval_seconds = 0.05
+    agent._last_flush = time.time()
+
+    for mood in ("calm", "happy"):
+        agent._cache_put(f"{mood}_english", [{"id": mood}])
+        agent._schedule_search_cache_flush()
+    assert agent._flush_task is None
+
+    await asyncio.sleep(0.1)
+    await agent._flush_task
+    assert agent._dirty_count == 0
+    assert AppleMusicAgent(cache_dir=tmp_path)._cache_get("happy_english") == [{"id": "happy"}]
@@ -0,0 +1,184 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from app.agents import audio_downloader
+from app.agents.audio_downloader import AudioDownloaderAgent, close_session
+
+@pytest.fixture
+def no_download_agent(tmp_path):
+    """Downloader whose network download fails the test if it is ever reached."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+
+    async def no_download(*args):
+        raise AssertionError("unexpected download")
+
+    agent._download_with_aiohttp = no_download
+    return agent
+
+@pytest.mark.asyncio
+async def test_download_audio_reuses_valid_file_on_disk(no_download_agent):
+    """Test that an audio file already on disk is served from the cache without downloading."""
+    agent = no_download_agent
+    url = "https://example.com/calm.mp3"
+    file_path = agent._cache_path_for(agent._generate_filename(url, "calm", "english"))
+    file_path.parent.mkdir(parents=True)
+    file_path.write_bytes(b"ID3" + b"\0" * 2048)
+
+    assert await agent.download_audio(url, "calm") == str(file_path)
+
+@pytest.mark.asyncio
+async def test_download_audio_moves_flat_cached_file_into_its_shard(tmp_path, no_download_agent):
+    """Test that a file cached before sharding is reused and moved into its shard directory."""
+    agent = no_download_agent
+    url = "https://example.com/calm.mp3"
+    filename = agent._generate_filename(url, "calm", "english")
+    (tmp_path / filename).write_bytes(b"ID3" + b"\0" * 2048)
+
+    assert await agent.download_audio(url, "calm") == str(agent._cache_path_for(filename))
+    assert agent._cache_path_for(filename).exists()
+    assert not (tmp_path / filename).exists()
+
+@pytest.mark.asyncio
+async def test_download_audio_forgets_trusted_file_deleted_from_disk(tmp_path):
+    """Test that a file trusted by its content hash is downloaded again once it is deleted."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    url = "https://example.com/calm.mp3"
+    downloads = []
+
+    async def fake_download(url, file_path, mood, language):
+        downloads.append(url)
+        file_path.write_bytes(b"ID3" + b"\0" * 2048)
+        agent._content_digests[file_path.name] = "digest"
+        return str(file_path)
+
+    agent._download_with_aiohttp = fake_download
+    path = await agent.download_audio(url, "calm")
+    assert await agent.download_audio(url, "calm") == path
+    assert len(downloads) == 1
+
+    agent._cache_path_for(agent._generate_filename(url, "calm", "english")).unlink()
+    assert await agent.download_audio(url, "calm") == path
+    assert len(downloads) == 2
+    assert agent._cache_path_for(agent._generate_filename(url, "calm", "english")).exists()
+
+@pytest.mark.asyncio
+async def test_content_digests_flush_is_debounced_and_persisted_on_close(tmp_path):
+    """Test that index updates are batched and pending ones are written by aclose."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    agent._digests_last_flush = time.time()
+    for i in range(3):
+        agent._content_digests[f"track{i}.mp3"] = f"digest{i}"
+        agent._schedule_content_digests_flush()
+    assert agent._digests_flush_task is None
+    await agent.aclose()
+
+    assert not list(tmp_path.glob("*.tmp"))
+    assert AudioDownloaderAgent(cache_dir=tmp_path)._content_digests == {
+        f"track{i}.mp3": f"digest{i}" for i in range(3)}
+
+@pytest_asyncio.fixture
+async def gone_url():
+    """URL on a local server that answers 404, with the shared session closed afterwards."""
+    from aiohttp import web
+
+    async def gone(request):
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get("/gone.mp3", gone)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/gone.mp3"
+    await close_session()
+    await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_download_audio_reports_missing_url_to_retriever(tmp_path, gone_url):
+    """Test that a 404 download marks the URL dead so the retriever stops offering it."""
+    from app.agents.audio_retriever import AudioRetrieverAgent
+
+    retriever = AudioRetrieverAgent(cache_dir=tmp_path)
+    agent = AudioDownloaderAgent(cache_dir=tmp_path, on_unavailable=retriever.mark_unavailable)
+
+    async def no_fallback(mood, language, error_message):
+        return None
+
+    agent._create_error_file = no_fallback
+    await agent.download_audio(gone_url, "calm")
+
+    assert retriever._is_dead(gone_url)
+    assert retriever._pick_live([gone_url, "https://example.com/live.mp3"]) == "https://example.com/live.mp3"
+
+@pytest.mark.asyncio
+async def test_error_file_is_created_after_download_slots_are_released(tmp_path, gone_url):
+    """Test that the fallback for a failed download doesn't hold the download's slots."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    agent.max_downloads_per_host = 1
+    agent._download_semaphore = asyncio.Semaphore(1)
+    slots_held = []
+
+    async def record_slots(mood, language, error_message):
+        slots_held.append((agent._download_semaphore.locked(), agent._host_semaphore("127.0.0.1").locked()))
+        return error_message
+
+    agent._create_error_file = record_slots
+    assert await agent.download_audio(gone_url, "calm") == "HTTP error 404"
+    assert slots_held == [(False, False)]
+
+@pytest.mark.asyncio
+async def test_close_flushes_index_and_keeps_shared_session(tmp_path):
+    """Test that close() still works, writes pending index updates and leaves the shared session open."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    session = await audio_downloader._get_session()
+    agent._digests_last_flush = time.time()
+    agent._content_digests["track.mp3"] = "digest"
+    agent._schedule_content_digests_flush()
+
+    await agent.close()
+    assert not session.closed
+    assert AudioDownloaderAgent(cache_dir=tmp_path)._content_digests == {"track.mp3": "digest"}
+    await close_session()
+
+@pytest.mark.asyncio
+async def test_content_digests_tail_is_flushed_by_timer(tmp_path):
+    """Test that index updates below the flush threshold are written once the flush interval passes."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    agent._digests_flush_interval_seconds = 0.05
+    agent._digests_last_flush = time.time()
+
+    for i in range(2):
+        agent._content_digests[f"track{i}.mp3"] = f"digest{i}"
+        agent._schedule_content_digests_flush()
+    assert agent._digests_flush_task is None
+
+    await asyncio.sleep(0.1)
+    await agent._digests_flush_task
+    assert agent._digests_dirty_count == 0
+    assert AudioDownloaderAgent(cache_dir=tmp_path)._content_digests == {"track0.mp3": "digest0", "track1.mp3": "digest1"}
+
+@pytest.mark.asyncio
+async def test_download_many_cancels_remaining_items_on_failure(tmp_path):
+    """Test that a failing follow-up step cancels the other items instead of leaving them running."""
+    agent = AudioDownloaderAgent(cache_dir=tmp_path)
+    cancelled = []
+
+    async def fake_download(url, mood, language):
+        return url
+
+    async def mix(path):
+        if path == "bad":
+            raise RuntimeError("mix failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(path)
+            raise
+
+    agent.download_audio = fake_download
+    with pytest.raises(RuntimeError, match="mix failed"):
+        await agent.download_many([("slow", "calm", "english"), ("bad", "calm", "english")], then=mix)
+    assert cancelled == ["slow"]
@@ -0,0 +1,46 @@
+import asyncio
+import time
+import pytest
+from app.agents import audio_mixer
+from app.agents.audio_mixer import AudioMixerAgent
+
+@pytest.mark.asyncio
+async def test_mix_voice_only_copies_voice_track(tmp_path, monkeypatch):
+    """Test that mixing without an ambient track returns the voice audio unchanged."""
+    monkeypatch.setattr(audio_mixer, "FFMPEG_PATH", "/usr/bin/ffmpeg")
+    voice = tmp_path / "voice.mp3"
+    voice.write_bytes(b"ID3" + b"\0" * 2048)
+    output = tmp_path / "out.mp3"
+
+    path = await AudioMixerAgent().mix(voice_path=str(voice), output_path=str(output))
+    assert path == str(output)
+    assert output.read_bytes() == voice.read_bytes()
+
+@pytest.mark.asyncio
+async def test_concurrent_decodes_of_one_ambient_loop_share_a_single_decode(tmp_path, monkeypatch):
+    """Test that concurrent mixes of the same ambient loop decode it once into an intact WAV."""
+    monkeypatch.setattr(audio_mixer, "FFMPEG_PATH", "/usr/bin/ffmpeg")
+    monkeypatch.setattr(audio_mixer, "_AMBIENT_CACHE_DIR", tmp_path / "decoded_ambient")
+    ambient = tmp_path / "rain.mp3"
+    ambient.write_bytes(b"ID3" + b"\0" * 2048)
+    decodes = []
+
+    def fake_ffmpeg(args, **kwargs):
+        # Write the output in pieces so overlapping decoders would interleave
+        decodes.append(args)
+        with open(args[-1], "wb") as output:
+            for chunk in (b"RIFF", b"WAVE", b"data"):
+                output.write(chunk)
+                output.flush()
+                time.sleep(0.02)
+
+    monkeypatch.setattr(audio_mixer.subprocess, "run", fake_ffmpeg)
+    paths = await asyncio.gather(*(
+        asyncio.to_thread(audio_mixer._decoded_ambient_path, str(ambient)) for _ in range(4)))
+
+    assert len(set(paths)) == 1
+    assert paths[0].endswith(".wav")
+    assert len(decodes) == 1
+    assert open(paths[0], "rb").read() == b"RIFFWAVEdata"
+    assert not list((tmp_path / "decoded_ambient").glob("*.tmp"))
+    assert len(audio_mixer._AMBIENT_DECODE_LOCKS) == 0
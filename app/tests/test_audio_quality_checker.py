@@ -0,0 +1,160 @@
+import math
+import struct
+import wave
+import pytest
+from app.agents import audio_quality_checker
+from app.agents.audio_quality_checker import AudioQualityCheckerAgent
+
+def write_wav(path, segments, frame_rate=8000):
+    """Write a mono 16-bit WAV made of (seconds, amplitude) segments of a 440 Hz tone."""
+    samples = []
+    for seconds, amplitude in segments:
+        for i in range(int(seconds * frame_rate)):
+            samples.append(int(amplitude * 32767 * math.sin(2 * math.pi * 440 * i / frame_rate)))
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(frame_rate)
+        wav.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+
+@pytest.mark.asyncio
+async def test_numpy_and_pydub_scans_agree(tmp_path, monkeypatch):
+    """Test that the vectorized numpy scans report the same results as pydub's chunk loop."""
+    monkeypatch.setattr(audio_quality_checker, "FFMPEG_PATH", None)
+    monkeypatch.setattr(audio_quality_checker, "FFPROBE_PATH", None)
+    audio_path = tmp_path / "meditation.wav"
+    write_wav(audio_path, [(17, 0.001), (20, 0.5), (7, 0.001)])
+    agent = AudioQualityCheckerAgent()
+
+    monkeypatch.setattr(audio_quality_checker, "NUMPY_AVAILABLE", True)
+    numpy_result = await agent.check_quality(str(audio_path))
+    monkeypatch.setattr(audio_quality_checker, "NUMPY_AVAILABLE", False)
+    pydub_result = await agent.check_quality(str(audio_path))
+
+    assert numpy_result[1]["intro_silence_seconds"] == 17.0
+    assert numpy_result[1]["outro_silence_seconds"] == 7.0
+    assert numpy_result[1]["volume_dbfs"] == pytest.approx(pydub_result[1]["volume_dbfs"], abs=0.01)
+    numpy_result[1].pop("volume_dbfs")
+    pydub_result[1].pop("volume_dbfs")
+    assert numpy_result == pydub_result
+
+class FakeProcess:
+    """Stand-in for an ffmpeg subprocess that prints a canned log."""
+
+    def __init__(self, log, returncode=0):
+        self.log = log
+        self.returncode = returncode
+
+    async def communicate(self):
+        return None, self.log.encode()
+
+@pytest.fixture
+def ffmpeg_output(tmp_path, monkeypatch):
+    """Run check_quality against canned ffprobe and ffmpeg output for a 10 minute file."""
+    audio_path = tmp_path / "meditation.mp3"
+    audio_path.write_bytes(b"ID3" + b"\0" * 4096)
+    probe = {
+        "streams": [{"codec_type": "audio", "channels": 2, "sample_rate": "44100"}],
+        "format": {"duration": "600.000000", "bit_rate": "128000"},
+    }
+    monkeypatch.setattr(audio_quality_checker, "FFMPEG_PATH", "/usr/bin/ffmpeg")
+    monkeypatch.setattr(audio_quality_checker, "FFPROBE_PATH", "/usr/bin/ffprobe")
+    monkeypatch.setattr(audio_quality_checker, "_probe_cached", lambda path, mtime, size: probe)
+
+    async def check(log, returncode=0, duration="600.000000"):
+        probe["format"]["duration"] = duration
+        async def fake_exec(*args, **kwargs):
+            return FakeProcess(log, returncode)
+
+        monkeypatch.setattr(audio_quality_checker.asyncio, "create_subprocess_exec", fake_exec)
+        return await AudioQualityCheckerAgent().check_quality(str(audio_path))
+
+    return check
+
+@pytest.mark.asyncio
+async def test_ffmpeg_intro_silence(ffmpeg_output):
+    """Test that a silence starting at (nearly) zero is reported as the intro."""
+    is_acceptable, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 0.04\n"
+        "[silencedetect @ 0x1] silence_end: 20.5 | silence_duration: 20.46\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    assert details["intro_silence_seconds"] == 20.5
+    assert details["outro_silence_seconds"] == 0
+    assert details["volume_dbfs"] == -20.3
+    assert details["issues"] == ["Long silent intro: 20.5 seconds"]
+    assert is_acceptable
+
+@pytest.mark.asyncio
+async def test_ffmpeg_silence_after_start_is_not_an_intro(ffmpeg_output):
+    """Test that a silence starting after the tolerance is not counted as the intro."""
+    _, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 0.5\n"
+        "[silencedetect @ 0x1] silence_end: 20.5 | silence_duration: 20\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    assert details["intro_silence_seconds"] == 0
+
+@pytest.mark.asyncio
+async def test_ffmpeg_trailing_silence_with_final_end(ffmpeg_output):
+    """Test that a silence ending within 50 ms of the end of the file is the outro."""
+    is_acceptable, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 592\n"
+        "[silencedetect @ 0x1] silence_end: 599.96 | silence_duration: 7.96\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    assert details["intro_silence_seconds"] == 0
+    assert details["outro_silence_seconds"] == 8.0
+    assert details["issues"] == ["Long silent outro: 8.0 seconds"]
+    assert is_acceptable
+
+@pytest.mark.asyncio
+async def test_ffmpeg_silence_ending_before_the_end_is_not_an_outro(ffmpeg_output):
+    """Test that a silence that ends before the last 50 ms is not counted as the outro."""
+    _, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 590\n"
+        "[silencedetect @ 0x1] silence_end: 598 | silence_duration: 8\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    assert details["outro_silence_seconds"] == 0
+
+@pytest.mark.asyncio
+async def test_ffmpeg_trailing_silence_without_final_end(ffmpeg_output):
+    """Test that a silence with no silence_end lasts until the end of the file."""
+    _, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 12\n"
+        "[silencedetect @ 0x1] silence_end: 13 | silence_duration: 1\n"
+        "[silencedetect @ 0x1] silence_start: 597\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    assert details["intro_silence_seconds"] == 0
+    assert details["outro_silence_seconds"] == 3.0
+    assert details["issues"] == []
+
+@pytest.mark.asyncio
+async def test_ffmpeg_digital_silence(ffmpeg_output):
+    """Test that a mean volume of -inf is reported as too quiet."""
+    is_acceptable, details = await ffmpeg_output(
+        "[silencedetect @ 0x1] silence_start: 0\n"
+        "[Parsed_volumedetect_1 @ 0x2] mean_volume: -inf dB\n")
+    assert details["volume_dbfs"] == float("-inf")
+    assert details["intro_silence_seconds"] == 30.0
+    assert details["outro_silence_seconds"] == 10.0
+    assert "Audio may be too quiet: -inf dBFS" in details["issues"]
+    assert not is_acceptable
+
+@pytest.mark.asyncio
+async def test_ffmpeg_failure_is_reported(ffmpeg_output):
+    """Test that a non-zero ffmpeg exit fails the check with an error."""
+    is_acceptable, details = await ffmpeg_output("Invalid data found when processing input\n", returncode=1)
+    assert not is_acceptable
+    assert "ffmpeg exited with code 1" in details["error"]
+
+@pytest.mark.asyncio
+async def test_short_file_is_rejected_without_analysis(ffmpeg_output):
+    """Test that a file rejected from the probe reports the same details keys as an analyzed one."""
+    _, analyzed = await ffmpeg_output("[Parsed_volumedetect_1 @ 0x2] mean_volume: -20.3 dB\n")
+    is_acceptable, details = await ffmpeg_output("unexpected ffmpeg run", returncode=1, duration="180.0")
+    assert not is_acceptable
+    assert details.keys() == analyzed.keys()
+    assert details["volume_dbfs"] is None
+    assert details["intro_silence_seconds"] is None
+    assert details["issues"] == [
+        "Duration (3.0 min) outside ideal range (8-12 min)",
+        "Duration (3.0 min) outside acceptable range (5-15 min)",
+    ]
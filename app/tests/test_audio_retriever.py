@@ -0,0 +1,116 @@
+import asyncio
+import gc
+import threading
+import time
+import weakref
+import pytest
+from app.agents import audio_retriever
+from app.agents.audio_retriever import AudioRetrieverAgent
+
+@pytest.mark.asyncio
+async def test_find_meditation_uses_cache_without_http(tmp_path):
+    """Test that a cached mood is answered without any search or page fetch."""
+    agent = AudioRetrieverAgent(cache_dir=tmp_path)
+    agent.youtube_cache["calm_english"] = [{"url": "https://www.youtube.com/watch?v=abc", "title": "Calm"}]
+
+    async def no_http(*args, **kwargs):
+        raise AssertionError("unexpected HTTP request")
+
+    agent._fetch_page = no_http
+    agent._search_youtube = no_http
+    url, source_info = await agent.find_meditation("Calm")
+    assert url == "https://www.youtube.com/watch?v=abc"
+    assert source_info["title"] == "Calm"
+
+@pytest.mark.asyncio
+async def test_find_suitable_videos_keeps_searching_past_unsuitable_results(tmp_path):
+    """Test that a query returning only unsuitable videos does not end the search early."""
+    agent = AudioRetrieverAgent(cache_dir=tmp_path)
+    results = {
+        "long": [f"https://www.youtube.com/watch?v=long{i}" for i in range(10)],
+        "good": [f"https://www.youtube.com/watch?v=good{i}" for i in range(20)],
+    }
+
+    async def fake_search(query):
+        if query == "good":
+            await asyncio.sleep(0.05)
+        return results[query]
+
+    async def fake_info(url):
+        duration = 3600 if "long" in url else 600
+        return {"url": url, "title": "", "duration_seconds": duration}
+
+    agent._search_youtube = fake_search
+    agent._get_youtube_video_info = fake_info
+    entries = await agent._find_suitable_videos(("long", "good"))
+    assert len(entries) == 5
+    assert all("good" in entry["url"] for entry in entries)
+
+def test_client_from_finished_loop_is_dropped():
+    """Test that a client left over from an earlier event loop is dropped when a new loop asks for one."""
+    # Needs two separate event loops, so it drives them with asyncio.run
+    old_client = weakref.ref(asyncio.run(audio_retriever._get_client()))
+
+    async def replace_and_close():
+        client = await audio_retriever._get_client()
+        await audio_retriever.close_client()
+        return client
+
+    assert asyncio.run(replace_and_close()) is not old_client()
+    gc.collect()
+    assert old_client() is None
+
+def test_live_loops_keep_their_own_clients():
+    """Test that a loop running in another thread keeps an open client of its own."""
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever)
+    thread.start()
+    try:
+        other_client = asyncio.run_coroutine_threadsafe(audio_retriever._get_client(), other_loop).result()
+
+        async def get_and_close():
+            client = await audio_retriever._get_client()
+            await audio_retriever.close_client()
+            return client
+
+        assert asyncio.run(get_and_close()) is not other_client
+        assert not other_client.is_closed
+        asyncio.run_coroutine_threadsafe(audio_retriever.close_client(), other_loop).result()
+        assert other_client.is_closed
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+@pytest.mark.asyncio
+async def test_concurrent_cache_saves_keep_the_newest_entries(tmp_path):
+    """Test that a slow save of an older snapshot can't overwrite a newer one."""
+    agent = AudioRetrieverAgent(cache_dir=tmp_path)
+    save = agent._save_youtube_cache
+
+    async def fake_find(queries):
+        if queries is agent.mood_to_query["happy"]:
+            await asyncio.sleep(0.01)
+        return [{"url": f"https://www.youtube.com/watch?v={queries[0]}", "title": ""}]
+
+    def slow_first_save(youtube_cache):
+        if len(youtube_cache) == 1:
+            time.sleep(0.1)
+        save(youtube_cache)
+
+    agent._find_suitable_videos = fake_find
+    agent._save_youtube_cache = slow_first_save
+    await asyncio.gather(agent.find_meditation("calm"), agent.find_meditation("happy"))
+
+    assert set(AudioRetrieverAgent(cache_dir=tmp_path).youtube_cache) == {"calm_english", "happy_english"}
+
+def test_failed_cache_save_removes_temp_file(tmp_path, monkeypatch):
+    """Test that a cache save that can't replace the file leaves no temp file behind."""
+    agent = AudioRetrieverAgent(cache_dir=tmp_path)
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(audio_retriever.os, "replace", failing_replace)
+    agent._save_youtube_cache({"calm_english": []})
+    assert not list(tmp_path.glob("*.tmp"))
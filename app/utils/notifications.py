@@ -42,8 +42,9 @@ async def send_pushover_notification(title, message, priority=0):
             "priority": priority,
         }
         
-        # Send the notification
-        async with httpx.AsyncClient() as client:
+        # Send the notification with a client per call: the scheduler runs each check
+        # in its own event loop, so a client kept between calls would outlive its loop
+        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0)) as client:
             response = await client.post("https://api.pushover.net/1/messages.json", data=payload)
             
         if response.status_code == 200:
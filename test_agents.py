@@ -37,7 +37,8 @@ async def test_audio_downloader():
     """Test the AudioDownloaderAgent."""
     print("\n=== Testing AudioDownloaderAgent ===")
     retriever = AudioRetrieverAgent()
-    downloader = AudioDownloaderAgent()
+    # Downloads that come back 404/410 tell the retriever to stop offering that URL
+    downloader = AudioDownloaderAgent(on_unavailable=retriever.mark_unavailable)
     
     # Test with a known URL
     test_url = "https://www.freemindfulness.org/FreeMindfulness3MinuteBreathing.mp3"
@@ -59,7 +60,8 @@ async def test_quality_checker():
     """Test the AudioQualityCheckerAgent."""
     print("\n=== Testing AudioQualityCheckerAgent ===")
     retriever = AudioRetrieverAgent()
-    downloader = AudioDownloaderAgent()
+    # Downloads that come back 404/410 tell the retriever to stop offering that URL
+    downloader = AudioDownloaderAgent(on_unavailable=retriever.mark_unavailable)
     quality_checker = AudioQualityCheckerAgent()
     
     # Test with a known URL